@@ -0,0 +1,290 @@
+import time
+
+import numpy as np
+import psycopg2
+
+import cache
+import config
+import cube
+import data
+import db
+import instrument
+import queries
+import rollups
+import versions
+
+
+# The dashboard's filter / aggregate building blocks. In 'pandas' mode they
+# work on the cached in-memory tables; in 'sql' mode the same request is
+# turned into a parameterized query so only the result rows are fetched.
+
+
+def sql_mode():
+    # the snapshot backend has no database to push queries down to
+    return config.QUERY_MODE == 'sql' and config.BACKEND == 'postgres'
+
+
+# rollups that were not found in the database, retried after CACHE_TTL
+_missing_rollups = {}
+
+
+def _from_rollup(table, keys, metrics, compute):
+    # answer from the smallest rollup covering keys/metrics, else from the raw table
+    rollup = rollups.find(table, keys, metrics)
+    missing_since = _missing_rollups.get(rollup)
+    if rollup is not None and (missing_since is None or time.monotonic() - missing_since > config.CACHE_TTL):
+        try:
+            return compute(rollup, rollups.ROW_COUNT)
+        except (psycopg2.errors.UndefinedTable, FileNotFoundError):
+            # the ETL has not built this rollup yet
+            _missing_rollups[rollup] = time.monotonic()
+    return compute(table, None)
+
+
+# distinct filter values per (table, column); stream.py asks for each one
+# twice per multiselect on every rerun
+_options_cache = cache.StampedLRU(64)
+
+
+def _options(table, column):
+    if sql_mode():
+        query, params = queries.distinct(table, column)
+        return db.read_frame(query, params)[column].tolist()
+    return data.get_table(table)[column].unique().tolist()
+
+
+def options(table, column):
+    return list(_options_cache.get((table, column), stamp(table), lambda: _options(table, column)))
+
+
+def filter_rows(table, year=None, quarter=None, state=None):
+    return data.select(table, year, quarter, state)
+
+
+### dense state x year x quarter cubes (see cube.py)
+
+_cubes = cache.StampedLRU(len(cube.CUBES))
+
+
+def _cube(table):
+    return _cubes.get(table, stamp(table), lambda: cube.build(table, data.get_table(table)))
+
+
+def cube_for(table):
+    # the table's cube in pandas mode, else None
+    if sql_mode() or table not in cube.CUBES:
+        return None
+    return _cube(table)
+
+
+def growth(table, metric, period='quarter', year=None, quarter=None, state=None, by_state=False):
+    # quarter-over-quarter / year-over-year growth of `metric` summed over
+    # the selected states; answered from the table's cube in either mode
+    if table not in cube.CUBES:
+        raise ValueError(f"no cube for table '{table}'")
+    return _cube(table).growth(metric, period, by_state=by_state, year=year, quarter=quarter, state=state)
+
+
+def total(table, metrics, year=None, quarter=None, state=None):
+
+    table_cube = cube_for(table)
+    if table_cube is not None and set(metrics) <= set(table_cube.values):
+        return {metric: table_cube.total(metric, year=year, quarter=quarter, state=state) for metric in metrics}
+
+    def compute(source, weight):
+        if sql_mode():
+            query, params = queries.total(source, metrics, year, quarter, state)
+            return db.read_frame(query, params).to_dict('records')[0]
+        rows = filter_rows(source, year, quarter, state)
+        return {metric: rows[metric].sum() for metric in metrics}
+
+    return _from_rollup(table, ['year', 'quarter', 'state'], metrics, compute)
+
+
+def group(table, by, metric, agg='sum', year=None, quarter=None, state=None,
+          order='key', limit=None, ties='first'):
+
+    def compute(source, weight):
+        if sql_mode():
+            query, params = queries.group(source, by, metric, agg, year, quarter, state, order, limit, weight, ties)
+            return db.read_frame(query, params)
+
+        rows = filter_rows(source, year, quarter, state)
+        if agg == 'mean' and weight is not None:
+            sums = rows.groupby(by, observed=True)[[metric, weight]].sum()
+            return (sums[metric] / sums[weight]).rename(metric).reset_index()
+        return rows.groupby(by, observed=True)[metric].agg(agg).reset_index()
+
+    table_cube = cube_for(table)
+    if table_cube is not None and by in table_cube.axes and metric in table_cube.values and agg in ('sum', 'mean'):
+        result = table_cube.group(by, metric, agg, year=year, quarter=quarter, state=state)
+    else:
+        result = _from_rollup(table, [by, 'year', 'quarter', 'state'], [metric], compute)
+    if sql_mode():
+        return result
+
+    if order == 'metric' and limit is not None:
+        # partial selection instead of a full sort; groups come out of the
+        # groupby in key order, so keep='first' breaks ties by key like SQL
+        result = result.nlargest(limit, metric, keep='all' if ties == 'all' else 'first')
+    elif order == 'metric':
+        result = result.sort_values(by=metric, ascending=False, kind='stable')
+    elif limit is not None:
+        result = result.head(limit)
+    return result.reset_index(drop=True)
+
+
+### top-K tables, memoized per table / metric / grouping key / filter selection
+
+_top_k_cache = cache.StampedLRU(config.TOP_K_CACHE_SIZE)
+
+
+def _selection(values):
+    # the order things were picked in a multiselect does not change the result
+    return None if values is None else tuple(sorted(set(values)))
+
+
+def _published_stamp(tables):
+    # the versions the ETL published for `tables`; without version records,
+    # one CACHE_TTL-long time bucket
+    published = versions.published()
+    if published is None:
+        return int(time.monotonic() // config.CACHE_TTL)
+    return tuple(published.get(name) for name in tables)
+
+
+def stamp(*tables):
+    # changes whenever the data behind `tables` may have changed
+    if sql_mode():
+        return _published_stamp(list(tables) + rollups.for_tables(tables))
+    for table in tables:
+        data.get_table(table)  # reloads it once its TTL has run out
+    return tuple(data.generation(name) for name in list(tables) + rollups.for_tables(tables))
+
+
+@instrument.timed('top_k')
+def top_k(table, by, metric, year=None, quarter=None, state=None, k=10, ties='first'):
+    # the k groups with the largest `metric`; ties='all' also keeps every
+    # group tied with the k-th. The result is shared: do not modify it.
+    key = (table, by, metric, _selection(year), _selection(quarter), _selection(state), k, ties)
+    return _top_k_cache.get(key, stamp(table), lambda: group(
+        table, by, metric, year=year, quarter=quarter, state=state, order='metric', limit=k, ties=ties))
+
+
+def top_k_cache_info():
+    return _top_k_cache.stats()
+
+
+def ranked(df):
+    # display copy of a top-K result: Title Case headers, 1-based S.No first
+    ranked_df = df.rename(columns=str.title)
+    ranked_df.insert(0, 'S.No', range(1, len(ranked_df) + 1))
+    return ranked_df
+
+
+def _map_join_frames(kind):
+    # in-memory equivalent of queries.MAP_QUERIES for the snapshot backend
+    if kind == 'insurance':
+        fact = data.get_table('aggregated_insurance')[['state', 'state_id', 'year', 'quarter', 'count', 'amount']]
+        states = data.get_table('geo_state').dropna(subset=['latitude'])[['state_id', 'latitude', 'longitude']]
+        return fact.merge(states, on='state_id').drop(columns='state_id')
+
+    districts = data.get_table('geo_district').dropna(subset=['latitude'])[['district_id', 'latitude', 'longitude']]
+    if kind == 'transaction':
+        fact = data.get_table('map_trans')[['state', 'year', 'quarter', 'name', 'count', 'amount', 'district_id']]
+    else:
+        fact = data.get_table('map_user')[['state', 'year', 'quarter', 'name', 'registeredusers', 'appopens', 'district_id']]
+        fact = fact.rename(columns={'registeredusers': 'users'})
+    loc = fact.merge(districts, on='district_id').drop(columns='district_id')
+    return loc.rename(columns={'name': 'district'})
+
+
+# kind -> the tables its map join reads
+MAP_TABLES = {
+    'insurance': ('aggregated_insurance', 'geo_state'),
+    'transaction': ('map_trans', 'geo_district'),
+    'user': ('map_user', 'geo_district'),
+}
+
+# whole-table map joins (pandas mode), one per kind
+_map_join_cache = cache.StampedLRU(len(MAP_TABLES))
+
+
+# the map joins return a row per location and quarter: fetched through COPY
+MAP_CATEGORIES = ('state', 'district')
+
+
+def _map_join(kind):
+    query, params, columns = queries.map_join(kind)
+    return db.copy_frame(query, params, columns=columns, categories=MAP_CATEGORIES)
+
+
+def map_rows(kind):
+    # pandas mode: the whole map join, a row per location and quarter
+    if config.BACKEND == 'snapshot':
+        for table in MAP_TABLES[kind]:
+            data.get_table(table)  # reloads it once its TTL has run out
+        generations = tuple(data.generation(table) for table in MAP_TABLES[kind])
+        return _map_join_cache.get(kind, generations, lambda: _map_join_frames(kind))
+    return _map_join_cache.get(kind, _published_stamp(MAP_TABLES[kind]), lambda: _map_join(kind))
+
+
+def map_frame(kind, year, quarter, state):
+    # pandas mode: the map join's rows for the selection
+    loc = map_rows(kind)
+    return loc[(loc['year'].isin(year)) & (loc['quarter'].isin(quarter)) & (loc['state'].isin(state))]
+
+
+### map payloads: one row per location for the whole selection
+
+# kind -> (location keys, metrics)
+MAP_LAYERS = {
+    'insurance': (['state'], ['count', 'amount']),
+    'transaction': (['state', 'district'], ['count', 'amount']),
+    'user': (['state', 'district'], ['users', 'appopens']),
+}
+
+COORDINATES = ['latitude', 'longitude']
+
+
+def _coarsen(points, keys, metrics, max_points):
+    # merge nearby locations into grid cells, doubling the cell size until
+    # at most max_points remain; the label says how many were merged
+    cell = config.MAP_CELL_DEGREES
+    while True:
+        grid = [np.floor(points[column].to_numpy(dtype=np.float64) / cell) for column in COORDINATES]
+        grouped = points.groupby(grid, sort=False)
+        if grouped.ngroups <= max_points:
+            break
+        cell *= 2
+
+    label = keys[-1]
+    coarse = grouped.agg(**{key: (key, 'first') for key in keys},
+                         **{column: (column, 'mean') for column in COORDINATES},
+                         **{metric: (metric, 'sum') for metric in metrics},
+                         merged=(label, 'size')).reset_index(drop=True)
+    more = coarse['merged'] - 1
+    coarse[label] = coarse[label].astype(str) + np.where(more > 0, ' + ' + more.astype(str) + ' more', '')
+    return coarse.drop(columns='merged')
+
+
+@instrument.timed('map_points')
+def map_points(kind, year, quarter, state, max_points=config.MAP_MAX_POINTS):
+    # map_frame() summed over the selected years / quarters, so each location
+    # is one column instead of one per quarter stacked on top of each other
+    keys, metrics = MAP_LAYERS[kind]
+    if sql_mode():
+        query, params = queries.map_points(kind, keys, metrics, year, quarter, state)
+        points = db.read_frame(query, params)
+    else:
+        loc = map_frame(kind, year, quarter, state)
+        points = loc.groupby(keys + COORDINATES, observed=True, sort=False)[metrics].sum().reset_index()
+    if len(points) > max_points:
+        points = _coarsen(points, keys, metrics, max_points)
+
+    # only the columns the layer and tooltip read, in their shortest JSON form
+    # (~10 m precision, whole rupees / counts)
+    points = points[keys + COORDINATES + metrics].copy()
+    points[COORDINATES] = points[COORDINATES].astype(np.float64).round(4)
+    points[metrics] = points[metrics].round().astype(np.int64)
+    return points
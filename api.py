@@ -0,0 +1,267 @@
+import argparse
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import tornado.ioloop
+import tornado.web
+
+import analytics
+import cache
+import config
+import cube
+import data
+import insights
+import versions
+
+
+# Read-only JSON API over the numbers the dashboard shows, for consumers that
+# would otherwise scrape the Streamlit UI:
+#
+#     python api.py [--port 8600]
+#
+#     GET /v1/states/<insurance|transaction|user>        totals, overall and per state
+#     GET /v1/top/<insurance|transaction|user>/<level>   the "Selected Top 10" tables
+#     GET /v1/categories                                 transaction categories
+#     GET /v1/brands                                     registered devices per brand
+#     GET /v1/growth/<kind>/<quarter|year>               quarter-over-quarter / year-over-year growth
+#     GET /v1/insights, /v1/insights/<n>                 the Insights questions / series
+#     GET /v1/versions                                   published data versions
+#
+# year, quarter and state filter like the dashboard's multiselects: repeat
+# them (?year=2021&year=2022) or separate values with commas; a filter that
+# is left out selects everything.
+#
+# It serves from the same in-memory tables as the dashboard (data.py), so in
+# the default pandas query mode a request never touches Postgres. Encoded
+# responses are kept in a StampedLRU stamped with the data versions of the
+# tables they were computed from, and die with them. Tornado ships with
+# Streamlit; computation runs on a small thread pool off the event loop.
+
+logger = logging.getLogger('pulse.api')
+
+
+### what each endpoint serves
+
+# kind -> (table, metrics) for /v1/states/<kind>
+STATE_TOTALS = {
+    'insurance': ('aggregated_insurance', ['count', 'amount']),
+    'transaction': ('aggregated_transaction', ['transaction_count', 'transaction_amount']),
+    'user': ('map_user', ['registeredusers', 'appopens']),
+}
+
+# (kind, level) -> (table, group by, metric), as in the dashboard's top-10 panels
+TOP_10 = {
+    ('insurance', 'state'): ('aggregated_insurance', 'state', 'amount'),
+    ('insurance', 'district'): ('top_insurance_district', 'district', 'amount'),
+    ('insurance', 'pincode'): ('top_insurance_pincode', 'pincode', 'amount'),
+    ('transaction', 'state'): ('aggregated_transaction', 'state', 'transaction_amount'),
+    ('transaction', 'district'): ('top_transaction_district', 'district', 'amount'),
+    ('transaction', 'pincode'): ('top_transaction_pincode', 'pincode', 'amount'),
+    ('user', 'state'): ('map_user', 'state', 'registeredusers'),
+    ('user', 'district'): ('top_user_district', 'name', 'registeredusers'),
+    ('user', 'pincode'): ('top_user_pincode', 'pincode', 'registeredusers'),
+}
+
+QUESTIONS = list(insights.QUESTIONS)
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def _records(df):
+    return df.to_dict('records')
+
+
+def _state_totals(kind, year, quarter, state):
+    table, metrics = STATE_TOTALS[kind]
+    by_state = analytics.group(table, 'state', metrics[0], year=year, quarter=quarter, state=state)
+    for metric in metrics[1:]:
+        by_state = by_state.merge(analytics.group(table, 'state', metric, year=year, quarter=quarter, state=state),
+                                  on='state')
+    return {'total': analytics.total(table, metrics, year, quarter, state), 'states': _records(by_state)}
+
+
+def _top_10(kind, level, year, quarter, state):
+    table, by, metric = TOP_10[(kind, level)]
+    return {'rows': _records(analytics.ranked(analytics.top_k(table, by, metric, year, quarter, state)))}
+
+
+def _categories(year, quarter, state):
+    return {'rows': _records(analytics.group('aggregated_transaction', 'transaction_type', 'transaction_amount',
+                                             year=year, quarter=quarter, state=state, order='metric'))}
+
+
+def _brands(year, quarter, state):
+    return {'rows': _records(analytics.group('aggregated_user', 'brand', 'devicecount',
+                                             year=year, quarter=quarter, state=state, order='metric'))}
+
+
+def _growth(kind, period, year, quarter, state):
+    table, metrics = STATE_TOTALS[kind]
+    series = None
+    for metric in metrics:
+        metric_growth = analytics.growth(table, metric, period, year, quarter, state).rename(
+            columns={'growth': f'{metric}_growth'})
+        series = metric_growth if series is None else series.merge(metric_growth, on=['year', 'quarter'])
+    # no growth (first period, nothing to compare with) is null, not NaN
+    return {'rows': _records(series.astype(object).where(series.notna(), None))}
+
+
+def _insight(number):
+    question = QUESTIONS[number - 1]
+    return {'question': question, 'rows': _records(insights.answer(question))}
+
+
+def resolve(path):
+    # request path -> (tables it reads, whether filters apply, compute(*filters));
+    # LookupError for anything that is not an endpoint
+    parts = path.strip('/').split('/')
+    if parts[0] != 'v1':
+        raise LookupError(path)
+    endpoint, args = parts[1] if len(parts) > 1 else '', parts[2:]
+
+    if endpoint == 'states' and len(args) == 1:
+        kind = args[0]
+        return [STATE_TOTALS[kind][0]], True, lambda *filters: _state_totals(kind, *filters)
+    if endpoint == 'top' and len(args) == 2:
+        kind, level = args
+        return [TOP_10[(kind, level)][0]], True, lambda *filters: _top_10(kind, level, *filters)
+    if endpoint == 'growth' and len(args) == 2 and args[1] in cube.PERIODS:
+        kind, period = args
+        return [STATE_TOTALS[kind][0]], True, lambda *filters: _growth(kind, period, *filters)
+    if endpoint == 'categories' and not args:
+        return ['aggregated_transaction'], True, _categories
+    if endpoint == 'brands' and not args:
+        return ['aggregated_user'], True, _brands
+    if endpoint == 'insights' and not args:
+        return [], False, lambda: {'questions': [{'id': n, 'question': question}
+                                                 for n, question in enumerate(QUESTIONS, 1)]}
+    if endpoint == 'insights' and len(args) == 1 and args[0].isdigit() and 1 <= int(args[0]) <= len(QUESTIONS):
+        number = int(args[0])
+        return list(insights.tables_for(QUESTIONS[number - 1])), False, lambda: _insight(number)
+    raise LookupError(path)
+
+
+### filters
+
+def _values(arguments, cast):
+    values = [value.strip() for argument in arguments for value in argument.split(',') if value.strip()]
+    if not values:
+        return None
+    try:
+        return tuple(sorted(set(map(cast, values))))
+    except ValueError:
+        raise BadRequest(f"invalid filter value in {', '.join(values)}") from None
+
+
+def parse_filters(get_arguments):
+    # (year, quarter, state), each a sorted tuple or None for everything
+    return (_values(get_arguments('year'), int), _values(get_arguments('quarter'), int),
+            _values(get_arguments('state'), str))
+
+
+### responses
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f'{type(value).__name__} is not JSON serializable')
+
+
+def encode(payload):
+    return json.dumps(payload, default=_json_default, separators=(',', ':')).encode()
+
+
+_responses = cache.StampedLRU(config.API_CACHE_SIZE)
+
+
+def respond(path, filters, endpoint=None):
+    # encoded JSON body for one request; endpoint: resolve(path), if the
+    # caller already has it
+    tables, filtered, compute = endpoint or resolve(path)
+    if not filtered:
+        filters = ()
+    stamp = analytics.stamp(*tables) if tables else None
+
+    def build():
+        payload = compute(*[None if values is None else list(values) for values in filters])
+        if filtered:
+            payload = {'filters': dict(zip(('year', 'quarter', 'state'), filters)), **payload}
+        return encode(payload)
+
+    return _responses.get((path, filters), stamp, build)
+
+
+def cache_info():
+    return _responses.stats()
+
+
+### server
+
+_executor = ThreadPoolExecutor(config.API_THREADS, thread_name_prefix='pulse-api')
+
+
+class QueryHandler(tornado.web.RequestHandler):
+
+    async def get(self, path):
+        # only the path lookup is a 404: a KeyError / IndexError raised while
+        # computing the response is a bug and goes out as a 500
+        try:
+            endpoint = resolve(path)
+        except LookupError:
+            raise tornado.web.HTTPError(404, reason=f'no such endpoint: /{path}')
+        try:
+            filters = parse_filters(self.get_arguments)
+        except BadRequest as e:
+            raise tornado.web.HTTPError(400, reason=str(e))
+        body = await tornado.ioloop.IOLoop.current().run_in_executor(_executor, respond, path, filters, endpoint)
+        self.set_header('Content-Type', 'application/json')
+        # Tornado adds an ETag and answers If-None-Match with 304
+        self.write(body)
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header('Content-Type', 'application/json')
+        self.finish(encode({'error': self._reason}))
+
+
+class VersionsHandler(tornado.web.RequestHandler):
+
+    def get(self):
+        self.set_header('Content-Type', 'application/json')
+        self.write(encode({'published': versions.published(),
+                           'loaded': {table_name: info['version'] for table_name, info in data.cache_info().items()},
+                           'response_cache': cache_info()}))
+
+
+def make_app():
+    return tornado.web.Application([
+        (r'/v1/versions', VersionsHandler),
+        (r'/(v1/.*)', QueryHandler),
+    ])
+
+
+def warm():
+    # load every table before the first request instead of during it
+    if not analytics.sql_mode():
+        for table_name, seconds in data.load_tables().items():
+            logger.info('loaded %s in %.2fs', table_name, seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve the dashboard aggregations as JSON.')
+    parser.add_argument('--port', type=int, default=config.API_PORT)
+    parser.add_argument('--address', default='', help='interface to listen on (default: all)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    warm()
+    make_app().listen(args.port, address=args.address)
+    logger.info('serving on port %d', args.port)
+    tornado.ioloop.IOLoop.current().start()
+
+
+if __name__ == '__main__':
+    main()
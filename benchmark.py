@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+
+# Stage-by-stage timings of the ETL and of the work stream.py does on a
+# rerun, against a synthetic Pulse tree (synthetic.py) of a chosen size:
+#
+#     python benchmark.py --states 36 --districts 20 --pincodes 10 --years 6 \
+#         --output bench.json [--compare baseline.json]
+#
+# The dashboard stages read the Arrow snapshot backend, so no database is
+# needed. With --postgres the ETL's real load path (etl.load_postgres: COPY
+# into staging tables, swap, rollups, version bump) is timed too, against
+# the database the PULSE_DB_* settings point at; its tables are replaced.
+# Results are written as JSON (per-stage runs, min and median, plus
+# the scale and row counts) so runs from different commits can be compared
+# with --compare.
+
+STAGES = ['etl_parse', 'snapshot_write', 'postgres_load', 'startup_load', 'filters', 'top10', 'top10_cached',
+          'maps', 'insights', 'insights_cached']
+
+TOP_10_PANELS = [
+    ('aggregated_insurance', 'state', 'amount'),
+    ('top_insurance_district', 'district', 'amount'),
+    ('top_insurance_pincode', 'pincode', 'amount'),
+    ('aggregated_transaction', 'state', 'transaction_amount'),
+    ('top_transaction_district', 'district', 'amount'),
+    ('top_transaction_pincode', 'pincode', 'amount'),
+    ('map_user', 'state', 'registeredusers'),
+    ('top_user_district', 'name', 'registeredusers'),
+    ('top_user_pincode', 'pincode', 'registeredusers'),
+]
+
+# the table whose options fill each tab's filters
+FILTER_TABLES = ['aggregated_insurance', 'aggregated_transaction', 'aggregated_user',
+                 'map_trans', 'map_user', 'top_transaction_pincode']
+
+
+def _timed(results, stage, function):
+    started = time.perf_counter()
+    value = function()
+    results.setdefault(stage, []).append(time.perf_counter() - started)
+    return value
+
+
+def _selections(table):
+    df = data.get_table(table)
+    years, quarters = sorted(df['year'].unique().tolist()), sorted(df['quarter'].unique().tolist())
+    # the default (everything selected) and the one-year / one-quarter map view
+    return [(years, quarters, None), (years[-1:], quarters[-1:], None)]
+
+
+def run_filters():
+    for table in FILTER_TABLES:
+        for year, quarter, state in _selections(table):
+            data.select(table, year, quarter, state)
+
+
+def run_top10():
+    for table, by, metric in TOP_10_PANELS:
+        for year, quarter, state in _selections(table):
+            analytics.top_k(table, by, metric, year, quarter, state)
+
+
+def run_maps():
+    for kind, table, elevation in (('insurance', 'aggregated_insurance', 'count'),
+                                   ('transaction', 'map_trans', 'count/10000'),
+                                   ('user', 'map_user', 'users/100')):
+        # the map tabs always pass the state multiselect
+        state = analytics.options(table, 'state')
+        for year, quarter, _ in _selections(table):
+            points = analytics.map_points(kind, year, quarter, state)
+            layer = pdk.Layer('ColumnLayer', data=points, get_position=['longitude', 'latitude'],
+                              get_elevation=elevation, elevation_scale=10, radius=7000, pickable=True)
+            pdk.Deck(layer, initial_view_state=pdk.data_utils.compute_view(points[['longitude', 'latitude']])).to_json()
+
+
+def run_insights():
+    for question in insights.QUESTIONS:
+        insights.answer(question)
+        insights.chart(question)
+
+
+def run(args, workdir):
+    results = {}
+    tree = os.path.join(workdir, 'pulse')
+    scale = dict(states=args.states, districts=args.districts, pincodes=args.pincodes,
+                 years=args.years, quarters=args.quarters)
+    files = synthetic.write_tree(tree, **scale, seed=args.seed)
+
+    frames = None
+    for _ in range(args.repeat):
+        frames = _timed(results, 'etl_parse', lambda: geo.add_dimensions(dict(
+            etl.clean(ingest.ingest(tree, workers=args.workers)),
+            state_loc=synthetic.state_loc(args.states, args.districts, args.pincodes, seed=args.seed))))
+        _timed(results, 'snapshot_write', lambda: etl.write_snapshot(frames))
+        if args.postgres:
+            # etl.py prints a line per table
+            with contextlib.redirect_stdout(io.StringIO()):
+                _timed(results, 'postgres_load', lambda: etl.load_postgres(frames))
+
+    everything = data.tables + ['state_loc', *geo.KEYS] + list(rollups.ROLLUPS)
+    for _ in range(args.repeat):
+        # a reload bumps every table's generation, so the caches below start cold
+        _timed(results, 'startup_load', lambda: data.reload_tables(everything))
+        _timed(results, 'filters', run_filters)
+        _timed(results, 'top10', run_top10)
+        _timed(results, 'top10_cached', run_top10)
+        _timed(results, 'maps', run_maps)
+        _timed(results, 'insights', run_insights)
+        _timed(results, 'insights_cached', run_insights)
+
+    return {
+        'scale': dict(scale, files=files, seed=args.seed),
+        'rows': {table_name: len(df) for table_name, df in frames.items()},
+        'environment': {'python': platform.python_version(), 'pandas': pd.__version__,
+                        'numpy': np.__version__, 'commit': _commit(), 'cpus': os.cpu_count()},
+        'stages': {stage: {'min': round(min(runs), 4), 'median': round(statistics.median(runs), 4),
+                           'runs': [round(r, 4) for r in runs]}
+                   for stage, runs in ((stage, results[stage]) for stage in STAGES if stage in results)},
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def compare(report, baseline):
+    print(f"{'stage':<18}{'baseline':>12}{'now':>12}{'change':>10}")
+    for stage, timing in report['stages'].items():
+        before = baseline['stages'].get(stage, {}).get('median')
+        now = timing['median']
+        change = f'{(now - before) / before:+.0%}' if before else '-'
+        print(f"{stage:<18}{before if before is not None else '-':>12}{now:>12}{change:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the ETL and dashboard stages on synthetic Pulse data.')
+    parser.add_argument('--states', type=int, default=36)
+    parser.add_argument('--districts', type=int, default=20, help='districts per state')
+    parser.add_argument('--pincodes', type=int, default=10, help='pincodes per district')
+    parser.add_argument('--years', type=int, default=6)
+    parser.add_argument('--quarters', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='runs per stage')
+    parser.add_argument('--workers', type=int, default=None, help='ETL parser processes')
+    parser.add_argument('--postgres', action='store_true',
+                        help='also time the Postgres load (replaces the tables in the PULSE_DB_* database)')
+    parser.add_argument('--workdir', help='where the tree and snapshot go (default: a temp dir)')
+    parser.add_argument('--output', default='bench.json', help='JSON report')
+    parser.add_argument('--compare', help='earlier JSON report to compare against')
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix='pulse-bench-')
+    # config is read at import time: point the dashboard modules at this
+    # run's snapshot before importing them
+    os.environ['PULSE_BACKEND'] = 'snapshot'
+    os.environ['PULSE_QUERY_MODE'] = 'pandas'
+    os.environ['PULSE_SNAPSHOT_DIR'] = os.path.join(workdir, 'snapshot')
+    _import_dashboard()
+
+    try:
+        report = run(args, workdir)
+    finally:
+        if not args.workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+    for stage, timing in report['stages'].items():
+        print(f"{stage:<18}median {timing['median']:.4f}s  min {timing['min']:.4f}s")
+    print(f"report written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+def _import_dashboard():
+    global np, pd, pdk, analytics, data, etl, geo, ingest, insights, rollups, synthetic
+    import numpy as np
+    import pandas as pd
+    import pydeck as pdk
+
+    import analytics
+    import data
+    import etl
+    import geo
+    import ingest
+    import insights
+    import rollups
+    import synthetic
+
+
+if __name__ == '__main__':
+    main()
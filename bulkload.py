@@ -0,0 +1,98 @@
+import io
+
+from psycopg2 import sql
+
+
+# Bulk write stage for the ETL. Frames are streamed to Postgres with
+# COPY ... FROM STDIN (CSV) instead of DataFrame.to_sql's row-by-row
+# INSERTs. A full table load goes into a staging table that is indexed and
+# then swapped in by renaming it, inside the caller's transaction.
+
+SQL_TYPES = {'i': 'BIGINT', 'u': 'BIGINT', 'f': 'DOUBLE PRECISION', 'b': 'BOOLEAN'}
+
+# rows serialized per CSV chunk while streaming
+CHUNK_ROWS = 50000
+
+INDEX_COLUMNS = ['state', 'year', 'quarter']
+
+
+class _CsvStream(io.RawIOBase):
+
+    # file-like view over a frame, rendered to CSV a chunk at a time so the
+    # whole table never sits in memory as one string
+
+    def __init__(self, df, chunk_rows=CHUNK_ROWS):
+        self._chunks = (df.iloc[start:start + chunk_rows].to_csv(index=False, header=False).encode()
+                        for start in range(0, len(df), chunk_rows))
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while len(self._buffer) < len(b):
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
+def create_table(cursor, table_name, df, if_not_exists=False):
+    # same column types DataFrame.to_sql would pick
+    columns = sql.SQL(', ').join(
+        sql.SQL('{} {}').format(sql.Identifier(column), sql.SQL(SQL_TYPES.get(df[column].dtype.kind, 'TEXT')))
+        for column in df.columns)
+    statement = 'CREATE TABLE IF NOT EXISTS {} ({})' if if_not_exists else 'CREATE TABLE {} ({})'
+    cursor.execute(sql.SQL(statement).format(sql.Identifier(table_name), columns))
+
+
+def copy_frame(cursor, table_name, df):
+    statement = sql.SQL('COPY {} ({}) FROM STDIN WITH (FORMAT csv)').format(
+        sql.Identifier(table_name), sql.SQL(', ').join(map(sql.Identifier, df.columns)))
+    cursor.copy_expert(statement.as_string(cursor), io.BufferedReader(_CsvStream(df), buffer_size=1 << 20))
+
+
+def index_name(table_name):
+    return f'{table_name}_state_year_quarter_idx'
+
+
+def create_index(cursor, table_name, columns, name=None):
+    index_columns = [column for column in INDEX_COLUMNS if column in columns]
+    if not index_columns:
+        return
+    cursor.execute(sql.SQL('CREATE INDEX IF NOT EXISTS {} ON {} ({})').format(
+        sql.Identifier(name or index_name(table_name)), sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, index_columns))))
+
+
+def key_index_name(table_name):
+    return f'{table_name}_key_idx'
+
+
+def create_unique_index(cursor, table_name, columns, name=None):
+    cursor.execute(sql.SQL('CREATE UNIQUE INDEX IF NOT EXISTS {} ON {} ({})').format(
+        sql.Identifier(name or key_index_name(table_name)), sql.Identifier(table_name),
+        sql.SQL(', ').join(map(sql.Identifier, columns))))
+
+
+def replace_table(cursor, table_name, df, unique=None):
+    # load into <table>__staging, index it, then swap it in for <table>;
+    # readers keep seeing the old table until the transaction commits
+    staging = f'{table_name}__staging'
+    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(staging)))
+    create_table(cursor, staging, df)
+    copy_frame(cursor, staging, df)
+    create_index(cursor, staging, df.columns, name=index_name(staging))
+    if unique:
+        create_unique_index(cursor, staging, unique, name=key_index_name(staging))
+    cursor.execute(sql.SQL('ANALYZE {}').format(sql.Identifier(staging)))
+
+    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(table_name)))
+    cursor.execute(sql.SQL('ALTER TABLE {} RENAME TO {}').format(sql.Identifier(staging), sql.Identifier(table_name)))
+    for name in (index_name, key_index_name):
+        cursor.execute(sql.SQL('ALTER INDEX IF EXISTS {} RENAME TO {}').format(
+            sql.Identifier(name(staging)), sql.Identifier(name(table_name))))
@@ -0,0 +1,45 @@
+import threading
+from collections import OrderedDict
+
+
+class StampedLRU:
+
+    # Bounded, thread-safe memo shared by every session of the process.
+    # Each entry is stored with the data stamp it was computed from (see
+    # analytics.stamp); a lookup with a different stamp is a miss, so
+    # entries die with the data they were built from. When full, the least
+    # recently used entry is evicted.
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key, stamp, compute):
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None and cached[0] == stamp:
+                self._entries.move_to_end(key)
+                self._counters['hits'] += 1
+                return cached[1]
+            self._counters['misses'] += 1
+
+        # computed outside the lock; two sessions missing at once both
+        # compute and the later one wins, which is harmless for pure results
+        value = compute()
+        with self._lock:
+            self._entries[key] = (stamp, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, entries=len(self._entries), maxsize=self.maxsize)
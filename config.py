@@ -0,0 +1,80 @@
+import os
+
+
+### Database settings (override with environment variables)
+
+DB_HOST = os.environ.get('PULSE_DB_HOST', 'localhost')
+DB_PORT = os.environ.get('PULSE_DB_PORT', '5432')
+DB_USER = os.environ.get('PULSE_DB_USER', 'postgres')
+DB_PASSWORD = os.environ.get('PULSE_DB_PASSWORD', 'admin')
+DB_NAME = os.environ.get('PULSE_DB_NAME', 'phonepe_pulse')
+
+DB_URL = f'postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}'
+
+
+### Dashboard data cache
+
+# seconds between checks for new table versions published by the ETL
+VERSION_CHECK_SECONDS = float(os.environ.get('PULSE_VERSION_CHECK_SECONDS', '5'))
+# stores without version records: seconds a loaded table stays fresh
+# before the next rerun reloads it
+CACHE_TTL = int(os.environ.get('PULSE_CACHE_TTL', '900'))
+# store cached tables with categorical / narrow numeric dtypes (see data.compact)
+COMPACT_DTYPES = os.environ.get('PULSE_COMPACT_DTYPES', '1') == '1'
+# top-K results kept in memory (least recently used are evicted first)
+TOP_K_CACHE_SIZE = int(os.environ.get('PULSE_TOP_K_CACHE_SIZE', '256'))
+# Insights answers and rendered charts kept in memory
+INSIGHTS_CACHE_SIZE = int(os.environ.get('PULSE_INSIGHTS_CACHE_SIZE', '64'))
+
+
+### Connection pool shared by all dashboard sessions
+
+POOL_SIZE = int(os.environ.get('PULSE_POOL_SIZE', '8'))
+# seconds a query waits for a free connection before failing
+POOL_TIMEOUT = float(os.environ.get('PULSE_POOL_TIMEOUT', '10'))
+# tables fetched at once when the dashboard starts (one connection each)
+LOAD_WORKERS = int(os.environ.get('PULSE_LOAD_WORKERS', str(POOL_SIZE)))
+# a COPY result is buffered in memory up to this size, then on disk
+COPY_SPOOL_BYTES = int(os.environ.get('PULSE_COPY_SPOOL_MB', '64')) * 2**20
+
+
+### Where the dashboard does its filtering and aggregation
+# 'pandas' - load whole tables once (see data.py) and aggregate in memory
+# 'sql'    - push filters, GROUP BY and LIMIT down to Postgres; only the
+#            rows that are displayed are fetched
+
+QUERY_MODE = os.environ.get('PULSE_QUERY_MODE', 'pandas')
+
+
+### Storage backend the dashboard reads from
+# 'postgres' - the phonepe_pulse database
+# 'snapshot' - memory-mapped Arrow files written by the ETL (see snapshot.py)
+
+BACKEND = os.environ.get('PULSE_BACKEND', 'postgres')
+SNAPSHOT_DIR = os.environ.get('PULSE_SNAPSHOT_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'snapshot'))
+
+
+### Map layers
+# one column per location is shipped to the browser; past this many
+# locations, nearby ones are merged into grid cells (starting this size)
+
+MAP_MAX_POINTS = int(os.environ.get('PULSE_MAP_MAX_POINTS', '2000'))
+MAP_CELL_DEGREES = float(os.environ.get('PULSE_MAP_CELL_DEGREES', '0.25'))
+
+
+### JSON API (see api.py)
+
+API_PORT = int(os.environ.get('PULSE_API_PORT', '8600'))
+# encoded responses kept in memory
+API_CACHE_SIZE = int(os.environ.get('PULSE_API_CACHE_SIZE', '1024'))
+# threads computing responses off the event loop
+API_THREADS = int(os.environ.get('PULSE_API_THREADS', '4'))
+
+
+### Timing instrumentation (see instrument.py)
+
+INSTRUMENT = os.environ.get('PULSE_INSTRUMENT', '1') == '1'
+# one JSON log line per span on the 'pulse.timing' logger
+TIMING_LOG = os.environ.get('PULSE_TIMING_LOG', '0') == '1'
+# Prometheus text file rewritten after every rerun (unset: not written)
+METRICS_FILE = os.environ.get('PULSE_METRICS_FILE')
@@ -0,0 +1,155 @@
+import numpy as np
+import pandas as pd
+
+
+# Dense state x year x quarter (x extra key) arrays of a table's metrics.
+# Nearly every number on the dashboard is a sum over a (state, year,
+# quarter) selection; with the sums laid out as one array per metric, a
+# multiselect filter is an np.ix_ index and the sum is a reduction over a
+# few hundred cells instead of a scan of the table.
+#
+# Every cell also holds the number of raw rows folded into it (like
+# rollups.ROW_COUNT), so means are sum / rows and a group with no rows is
+# told apart from a group that sums to zero.
+
+AXES = ['state', 'year', 'quarter']
+
+# table -> (extra axes, metrics)
+CUBES = {
+    'aggregated_insurance': ([], ['count', 'amount']),
+    'aggregated_transaction': (['transaction_type'], ['transaction_count', 'transaction_amount']),
+    'aggregated_user': (['brand'], ['devicecount']),
+    'map_trans': ([], ['count', 'amount']),
+    'map_user': ([], ['registeredusers', 'appopens']),
+}
+
+ROWS = 'n_rows'
+
+PERIODS = ('quarter', 'year')
+
+
+def _calendar(values, axis):
+    # every year from the first to the last, every quarter 1-4: a period
+    # without data is an empty cell, so the neighbouring cell along the axis
+    # is always the previous calendar period (see Cube.growth)
+    present = pd.unique(values.dropna())
+    if axis == 'quarter':
+        labels = sorted(set(present) | {1, 2, 3, 4})
+    else:
+        labels = range(int(present.min()), int(present.max()) + 1) if len(present) else []
+    return pd.Index(np.asarray(labels, dtype=values.dtype))
+
+
+class Cube:
+
+    def __init__(self, df, metrics, extra=()):
+        self.axes = AXES + list(extra)
+        self.labels = {}
+        codes = []
+        for axis in self.axes:
+            if axis in PERIODS:
+                labels = _calendar(df[axis], axis)
+                axis_codes = labels.get_indexer(df[axis])
+            else:
+                axis_codes, labels = pd.factorize(df[axis], sort=True)
+            codes.append(axis_codes)
+            self.labels[axis] = labels
+        self._positions = {axis: {label: i for i, label in enumerate(labels)}
+                           for axis, labels in self.labels.items()}
+        self.shape = tuple(len(self.labels[axis]) for axis in self.axes)
+
+        size = int(np.prod(self.shape))
+        # rows with a missing key are left out, as groupby() leaves them out
+        known = np.logical_and.reduce([axis_codes >= 0 for axis_codes in codes])
+        flat = np.ravel_multi_index([axis_codes[known] for axis_codes in codes], self.shape)
+        self.values = {ROWS: np.bincount(flat, minlength=size).reshape(self.shape)}
+        for metric in metrics:
+            column = df[metric].to_numpy()[known]
+            # float64 sums of integers are exact below 2**53; NaN counts as 0
+            # like it does in groupby().sum()
+            weights = np.nan_to_num(column.astype(np.float64))
+            sums = np.bincount(flat, weights=weights, minlength=size).reshape(self.shape)
+            self.values[metric] = sums.astype(np.int64) if column.dtype.kind in 'iu' else sums
+
+    def _index(self, filters):
+        # filters: axis -> selected labels (None = all); labels that are not
+        # in the cube select nothing, like isin()
+        index = []
+        for axis in self.axes:
+            selected = filters.get(axis)
+            if selected is None:
+                index.append(np.arange(len(self.labels[axis])))
+            else:
+                # sorted, so groups come out in key order whatever the pick order
+                positions = self._positions[axis]
+                index.append(np.array(sorted({positions[label] for label in selected if label in positions}),
+                                      dtype=np.intp))
+        return np.ix_(*index)
+
+    def _select(self, metric, filters):
+        return self.values[metric][self._index(filters)]
+
+    def total(self, metric, **filters):
+        return self._select(metric, filters).sum()
+
+    def group(self, by, metric, agg='sum', **filters):
+        # DataFrame [by, metric] over the groups with rows, in key order
+        others = tuple(i for i, axis in enumerate(self.axes) if axis != by)
+        position = self.axes.index(by)
+        keep = self._index(filters)[position].ravel()
+        rows = self._select(ROWS, filters).sum(axis=others)
+        values = self._select(metric, filters).sum(axis=others)
+        if agg == 'mean':
+            values = values / np.where(rows > 0, rows, 1)
+        elif agg != 'sum':
+            raise ValueError(f"cube aggregates are 'sum' and 'mean', not '{agg}'")
+        present = rows > 0
+        return pd.DataFrame({by: self.labels[by][keep[present]], metric: values[present]})
+
+    def growth(self, metric, period='quarter', by_state=False, **filters):
+        # quarter-over-quarter (period='quarter') or year-over-year
+        # ('year': same quarter a year earlier) growth of the summed metric,
+        # one row per (state,) year, quarter with data; growth is NaN where
+        # the previous period has no data or sums to zero
+        if period not in PERIODS:
+            raise ValueError(f"growth period must be one of {', '.join(PERIODS)}, not '{period}'")
+        # computed over the whole time range, so the period before the first
+        # selected one counts, and then cut down to the selection
+        years, quarters = filters.get('year'), filters.get('quarter')
+        filters = dict(filters, year=None, quarter=None)
+        extra = tuple(range(3, len(self.axes)))
+        rows = self._select(ROWS, filters).sum(axis=extra)
+        values = self._select(metric, filters).sum(axis=extra).astype(np.float64)
+        if not by_state:
+            rows, values = rows.sum(axis=0, keepdims=True), values.sum(axis=0, keepdims=True)
+
+        previous = np.full_like(values, np.nan)
+        previous_rows = np.zeros_like(rows)
+        if period == 'year':
+            previous[:, 1:, :], previous_rows[:, 1:, :] = values[:, :-1, :], rows[:, :-1, :]
+        else:
+            # years x quarters flattened into one timeline
+            n = values.shape[0]
+            previous.reshape(n, -1)[:, 1:] = values.reshape(n, -1)[:, :-1]
+            previous_rows.reshape(n, -1)[:, 1:] = rows.reshape(n, -1)[:, :-1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            growth = np.where((previous_rows > 0) & (previous != 0), values / previous - 1, np.nan)
+
+        cells = np.nonzero(rows > 0)
+        result = pd.DataFrame({'year': self.labels['year'][cells[1]], 'quarter': self.labels['quarter'][cells[2]],
+                               metric: values[cells].astype(self.values[metric].dtype),
+                               'growth': growth[cells]})
+        if by_state:
+            # cells[0] counts within the selected states
+            selected = self._index(filters)[0].ravel()
+            result.insert(0, 'state', self.labels['state'][selected[cells[0]]])
+        if years is not None:
+            result = result[result['year'].isin(years)]
+        if quarters is not None:
+            result = result[result['quarter'].isin(quarters)]
+        return result.reset_index(drop=True)
+
+
+def build(table, df):
+    extra, metrics = CUBES[table]
+    return Cube(df, metrics, extra)
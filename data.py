@@ -0,0 +1,268 @@
+import contextvars
+import itertools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+
+import config
+import db
+import instrument
+import names
+import snapshot
+import versions
+
+
+logger = logging.getLogger('pulse.data')
+
+tables = [
+    'aggregated_user',
+    'aggregated_insurance',
+    'aggregated_transaction',
+    'map_insurance',
+    'map_trans',
+    'map_user',
+    'top_insurance_district',
+    'top_transaction_district',
+    'top_user_district',
+    'top_insurance_pincode',
+    'top_transaction_pincode',
+    'top_user_pincode'
+]
+
+
+# Streamlit re-executes stream.py on every widget click, but imported modules
+# live for the whole server process. Keeping the frames here means each table
+# is fetched once per process and shared (read-only) by every session.
+#
+# A table is reloaded when the ETL publishes a new version of it (see
+# versions.py), and otherwise kept indefinitely. Only stores without version
+# records fall back to reloading every PULSE_CACHE_TTL seconds.
+
+_lock = threading.Lock()
+_table_locks = {}
+_frames = {}
+_loaded_at = {}
+_memory = {}
+_indexes = {}
+_generations = {}
+_versions = {}
+_load_seconds = {}
+
+
+### compact in-memory schema
+
+# repeated labels -> categoricals; every table's 'state' shares one dictionary
+CATEGORY_COLUMNS = ['state', 'district', 'name', 'pincode', 'transaction_type', 'brand', 'label', 'new_label']
+SMALL_INTS = {'year': np.int16, 'quarter': np.int8}
+# coordinates and shares only; amounts keep float64 so sums stay exact
+FLOAT32_COLUMNS = ['lat', 'lng', 'latitude', 'longitude', 'percentage']
+
+# fixed once per process, before the first table is compacted: a dictionary
+# that grew as tables loaded would leave the earlier ones with fewer
+# categories, and merging two 'state' columns with different categories
+# falls back to object
+_state_lock = threading.Lock()
+_state_dtype = None
+
+
+def _state_categories():
+    # every canonical state name, plus any other state the ETL put in the
+    # geo_state dimension
+    states = set(names.STATE_NAMES.values())
+    try:
+        states.update(load_table('geo_state')['state'].dropna().astype(str))
+    except (FileNotFoundError, psycopg2.errors.UndefinedTable):
+        pass
+    return sorted(states)
+
+
+def _shared_state_dtype():
+    global _state_dtype
+    with _state_lock:
+        if _state_dtype is None:
+            _state_dtype = pd.CategoricalDtype(_state_categories())
+        return _state_dtype
+
+
+def compact(df):
+    df = df.copy()
+    for column in df.columns:
+        values = df[column]
+        if column == 'state':
+            state_dtype = _shared_state_dtype()
+            if values.dropna().isin(state_dtype.categories).all():
+                df[column] = values.astype(state_dtype)
+            else:
+                # a state published after the dictionary was fixed; the next
+                # process start picks it up
+                logger.warning('state names outside the shared dictionary: %s',
+                               ', '.join(sorted(set(values.dropna()) - set(state_dtype.categories))))
+                df[column] = values.astype('category')
+        elif column in CATEGORY_COLUMNS:
+            df[column] = values.astype('category')
+        elif column in SMALL_INTS and values.dtype.kind in 'iu':
+            df[column] = values.astype(SMALL_INTS[column])
+        elif column in FLOAT32_COLUMNS and values.dtype.kind == 'f':
+            df[column] = values.astype(np.float32)
+        elif values.dtype.kind in 'iu':
+            # counts: the narrowest integer type that holds every value
+            df[column] = pd.to_numeric(values, downcast='integer')
+    return df
+
+
+def memory_usage(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def plain_memory_usage(df):
+    # memory_usage() with every categorical column as plain values: the
+    # baseline compact() is measured against, since copy_frame() already
+    # hands the text columns over as categoricals
+    total = memory_usage(df)
+    for column in df.columns:
+        values = df[column]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            plain = values.astype(values.cat.categories.dtype)
+            total += int(plain.memory_usage(index=False, deep=True) - values.memory_usage(index=False, deep=True))
+    return total
+
+
+### (year, quarter, state) row index
+
+INDEX_KEYS = ['year', 'quarter', 'state']
+
+
+def build_index(df):
+    # {(year, quarter, state): row positions} plus the distinct values of each
+    # key, so a filter is answered by looking up only the selected combinations
+    if not set(INDEX_KEYS) <= set(df.columns):
+        return None
+    positions = df.groupby(INDEX_KEYS, observed=True).indices
+    levels = [sorted(set(key[i] for key in positions)) for i in range(len(INDEX_KEYS))]
+    return positions, levels
+
+
+def select(table_name, year=None, quarter=None, state=None, ttl=config.CACHE_TTL):
+    # rows of the table matching the filters (None = no filter), in table order
+    get_table(table_name, ttl)
+    with _lock:
+        df, index = _frames[table_name], _indexes[table_name]
+
+    filters = [year, quarter, state]
+    if index is None:
+        mask = np.ones(len(df), dtype=bool)
+        for column, values in zip(INDEX_KEYS, filters):
+            if values is not None:
+                mask &= df[column].isin(values).to_numpy()
+        return df[mask]
+
+    positions, levels = index
+    wanted = [level if values is None else list(dict.fromkeys(values)) for values, level in zip(filters, levels)]
+    parts = [positions[key] for key in itertools.product(*wanted) if key in positions]
+    rows = np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.intp)
+    return df.iloc[rows]
+
+
+def load_table(table_name, version=None):
+    if config.BACKEND == 'snapshot':
+        return snapshot.read_table(table_name, version=version)
+    query = sql.SQL('SELECT * FROM {}').format(sql.Identifier(table_name))
+    return db.copy_frame(query, categories=CATEGORY_COLUMNS if config.COMPACT_DTYPES else ())
+
+
+def _is_fresh(table_name, ttl, version):
+    loaded_at = _loaded_at.get(table_name)
+    if loaded_at is None:
+        return False
+    if version is not None:
+        return _versions.get(table_name) == version
+    return ttl is None or time.monotonic() - loaded_at < ttl
+
+
+def get_table(table_name, ttl=config.CACHE_TTL):
+
+    # read before the table: if the ETL commits in between, the frame is
+    # newer than its recorded version and is merely reloaded once more
+    version = versions.of(table_name)
+    if _is_fresh(table_name, ttl, version):
+        return _frames[table_name]
+
+    # one loader per table; concurrent sessions wait for it instead of
+    # issuing the same SELECT * in parallel
+    with _lock:
+        table_lock = _table_locks.setdefault(table_name, threading.Lock())
+    with table_lock:
+        if not _is_fresh(table_name, ttl, version):
+            started = time.perf_counter()
+            with instrument.span(f'load:{table_name}'):
+                df = load_table(table_name, version)
+                if config.BACKEND == 'snapshot':
+                    instrument.add_rows(len(df))
+                before = plain_memory_usage(df)
+                if config.COMPACT_DTYPES:
+                    df = compact(df)
+                index = build_index(df)
+            with _lock:
+                _frames[table_name] = df
+                _indexes[table_name] = index
+                _loaded_at[table_name] = time.monotonic()
+                _versions[table_name] = version
+                _load_seconds[table_name] = time.perf_counter() - started
+                _memory[table_name] = (before, memory_usage(df))
+                _generations[table_name] = _generations.get(table_name, 0) + 1
+        return _frames[table_name]
+
+
+def generation(table_name):
+    # bumped every time the table is (re)loaded; None until the first load
+    return _generations.get(table_name)
+
+
+def load_tables(table_names=None, workers=config.LOAD_WORKERS):
+    # fetch every table that is not fresh at once, so a cold start takes
+    # about as long as the largest table rather than the sum of all of them;
+    # -> {table: load seconds} of the tables that were loaded
+    table_names = list(table_names or tables)
+    stale = [table_name for table_name in table_names
+             if not _is_fresh(table_name, config.CACHE_TTL, versions.of(table_name))]
+    if not stale:
+        return {}
+    # each load runs in a copy of the caller's context, so its timing span
+    # nests under the caller's
+    with ThreadPoolExecutor(min(workers, len(stale)), thread_name_prefix='pulse-load') as pool:
+        list(pool.map(lambda table_name, context: context.run(get_table, table_name),
+                      stale, [contextvars.copy_context() for _ in stale]))
+    with _lock:
+        return {table_name: round(_load_seconds[table_name], 3) for table_name in stale}
+
+
+def reload_tables(table_names=None):
+    # drop the cached frames and fetch them again; with nothing cached (SQL
+    # mode) only the versions are re-read, so the stamped caches miss
+    versions.forget()
+    with _lock:
+        table_names = list(_frames if table_names is None else table_names)
+        for table_name in table_names:
+            _loaded_at.pop(table_name, None)
+    if not table_names:
+        return {}
+    return load_tables(table_names)
+
+
+def cache_info():
+    now = time.monotonic()
+    with _lock:
+        return {table_name: {'rows': len(_frames[table_name]),
+                             'age_seconds': round(now - _loaded_at[table_name], 1),
+                             'version': _versions.get(table_name),
+                             'load_seconds': round(_load_seconds[table_name], 3),
+                             'memory_mb': round(_memory[table_name][1] / 2**20, 2),
+                             'memory_bytes': _memory[table_name][1],
+                             'memory_saved_mb': round((_memory[table_name][0] - _memory[table_name][1]) / 2**20, 2)}
+                for table_name in _loaded_at}
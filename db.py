@@ -0,0 +1,204 @@
+import queue
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+import psycopg2
+from psycopg2 import pool as pg_pool
+
+import config
+import instrument
+
+
+# SUM() over integer columns comes back as NUMERIC, which psycopg2 turns into
+# Decimal objects; map whole numbers to int and the rest to float instead.
+def _cast_numeric(value, cursor):
+    if value is None:
+        return None
+    return int(value) if value.lstrip('-').isdigit() else float(value)
+
+
+psycopg2.extensions.register_type(psycopg2.extensions.new_type(
+    psycopg2.extensions.DECIMAL.values, 'PULSE_NUMERIC', _cast_numeric))
+
+
+class PoolTimeout(pg_pool.PoolError):
+    pass
+
+
+class ConnectionPool:
+
+    # Bounded pool of psycopg2 connections shared by every session of the
+    # process. At most `maxsize` connections exist at once; a checkout waits
+    # up to `timeout` seconds for one to be returned before giving up.
+
+    def __init__(self, maxsize=config.POOL_SIZE, timeout=config.POOL_TIMEOUT, **connect_kwargs):
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._connect_kwargs = connect_kwargs
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(maxsize)
+        self._lock = threading.Lock()
+        self._in_use = 0
+        self._counters = {'created': 0, 'checkouts': 0, 'waits': 0,
+                          'timeouts': 0, 'discarded': 0, 'wait_seconds': 0.0}
+
+    def _count(self, name, value=1):
+        with self._lock:
+            self._counters[name] += value
+
+    def getconn(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+
+        if not self._slots.acquire(blocking=False):
+            self._count('waits')
+            started = time.monotonic()
+            acquired = self._slots.acquire(timeout=timeout)
+            self._count('wait_seconds', time.monotonic() - started)
+            if not acquired:
+                self._count('timeouts')
+                raise PoolTimeout(f"no database connection free after {timeout}s "
+                                  f"(pool size {self.maxsize})")
+
+        try:
+            conn = None
+            while conn is None:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = psycopg2.connect(**self._connect_kwargs)
+                    self._count('created')
+                else:
+                    if conn.closed:
+                        self._count('discarded')
+                        conn = None
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self._in_use += 1
+            self._counters['checkouts'] += 1
+        return conn
+
+    def putconn(self, conn, discard=False):
+        try:
+            if not discard and not conn.closed:
+                # never hand out a connection that is idle in a transaction
+                conn.rollback()
+        except psycopg2.Error:
+            discard = True
+
+        if discard or conn.closed:
+            if not conn.closed:
+                conn.close()
+            self._count('discarded')
+        else:
+            self._idle.put(conn)
+
+        with self._lock:
+            self._in_use -= 1
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        conn = self.getconn(timeout)
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            self.putconn(conn, discard=True)
+            raise
+        except Exception:
+            self.putconn(conn)
+            raise
+        else:
+            self.putconn(conn)
+
+    def closeall(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            conn.close()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['in_use'] = self._in_use
+        stats['idle'] = self._idle.qsize()
+        stats['maxsize'] = self.maxsize
+        stats['wait_seconds'] = round(stats['wait_seconds'], 3)
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(host=config.DB_HOST, user=config.DB_USER,
+                                       password=config.DB_PASSWORD, dbname=config.DB_NAME,
+                                       port=config.DB_PORT)
+    return _pool
+
+
+def read_frame(query, params=None, columns=None):
+    with instrument.span('sql'):
+        with get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(query, params)
+                result = cursor.fetchall()
+                if columns is None:
+                    columns = [desc[0] for desc in cursor.description]
+        instrument.add_rows(len(result))
+        return pd.DataFrame(result, columns=columns)
+
+
+# type oids of Postgres text columns (char, name, text, bpchar, varchar):
+# read as text, never inferred, so a pincode stays '560001'
+_TEXT_TYPES = {18, 19, 25, 1042, 1043}
+
+
+# what COPY writes for NULL. CSV's default, an unquoted empty field, can't
+# be told apart from '' once read_csv has dropped the quotes; with \N an
+# empty string stays '' (a text value that is exactly \N reads as NULL)
+NULL = '\\N'
+
+
+def _read_csv(buffer, described, columns, categories):
+    names = columns or [name for name, type_code in described]
+    text = [name for name, (_, type_code) in zip(names, described) if type_code in _TEXT_TYPES]
+    dtype = {name: 'category' if name in categories else str for name in text}
+    # 'NA' / 'NaN' in a text column are values; a float8 NaN comes out as 'NaN'
+    na_values = {name: [NULL] if name in text else [NULL, 'NaN'] for name in names}
+    # round_trip: the default float parser can be off by one ulp
+    return pd.read_csv(buffer, header=None, names=names, dtype=dtype, keep_default_na=False,
+                       na_values=na_values, true_values=['t'], false_values=['f'], float_precision='round_trip')
+
+
+def copy_frame(query, params=None, columns=None, categories=()):
+    # read_frame() for large results: the server streams the rows as CSV
+    # through COPY into a spooled buffer (in memory up to
+    # PULSE_COPY_SPOOL_MB, then on disk) and read_csv builds each column
+    # directly, so no Python tuple is made per row. Text columns named in
+    # `categories` come back as categoricals.
+    with instrument.span('sql'):
+        with tempfile.SpooledTemporaryFile(max_size=config.COPY_SPOOL_BYTES) as buffer:
+            with get_pool().connection() as conn:
+                with conn.cursor() as cursor:
+                    text = cursor.mogrify(query, params).decode()
+                    # column names and types, without running the query
+                    cursor.execute(f'SELECT * FROM ({text}) AS described LIMIT 0')
+                    described = [(desc.name, desc.type_code) for desc in cursor.description]
+                    cursor.copy_expert(f"COPY ({text}) TO STDOUT WITH (FORMAT csv, NULL '{NULL}')", buffer)
+            buffer.seek(0)
+            df = _read_csv(buffer, described, columns, categories)
+        instrument.add_rows(len(df))
+        return df
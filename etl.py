@@ -0,0 +1,256 @@
+import argparse
+import time
+
+import pandas as pd
+import psycopg2
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from sqlalchemy import create_engine, inspect
+
+import bulkload
+import config
+import geo
+import ingest
+import manifest
+import names
+import rollups
+import snapshot
+import versions
+
+
+# Command-line version of the phonepay.ipynb pipeline:
+#
+#     python etl.py /path/to/pulse --state-csv state_latlong.csv [--snapshot] [--full]
+#
+# parse the Pulse tree (ingest.py, names.py) -> build the geo dimension
+# and attach its integer keys (geo.py) -> write the Postgres tables -> rebuild
+# the rollups -> optionally write the Arrow snapshot.
+#
+# By default only files that are new or changed since the last run (see
+# manifest.py) are parsed, and their rows replace the matching
+# state/year/quarter partitions in one transaction. --full re-parses
+# everything and bulk-loads every table (see bulkload.py).
+#
+# Every table a run writes gets a new version (versions.py) in the same
+# transaction, which is what tells running dashboards to reload it.
+
+
+def clean(frames):
+    # names are already canonical (ingest.py runs names.canonicalize); this
+    # adds the notebook's map_insurance dedup and new_label columns
+    if 'map_insurance' in frames:
+        map_ins = frames['map_insurance'].drop_duplicates(subset=['label']).reset_index(drop=True)
+        map_ins['new_label'] = map_ins['state'] + map_ins['label']
+        frames['map_insurance'] = map_ins
+
+    for table_name in ('map_trans', 'map_user'):
+        if table_name in frames:
+            df = frames[table_name]
+            df['new_label'] = df['state'] + df['name']
+
+    return frames
+
+
+# tables not partitioned by state/year/quarter: upsert key columns
+UPSERT_KEYS = {
+    'map_insurance': ['new_label'],
+    'state_loc': ['state'],
+    geo.GEO_STATE: [geo.KEYS[geo.GEO_STATE]],
+    geo.GEO_DISTRICT: [geo.KEYS[geo.GEO_DISTRICT]],
+}
+
+
+def _unique(table_name):
+    return [geo.KEYS[table_name]] if table_name in geo.KEYS else None
+
+
+def _connect():
+    return psycopg2.connect(host=config.DB_HOST, user=config.DB_USER, password=config.DB_PASSWORD,
+                            dbname=config.DB_NAME, port=config.DB_PORT)
+
+
+def _stage(cursor, table_name, df):
+    cursor.execute(sql.SQL('CREATE TEMP TABLE {} (LIKE {}) ON COMMIT DROP').format(
+        sql.Identifier(f'stage_{table_name}'), sql.Identifier(table_name)))
+    bulkload.copy_frame(cursor, f'stage_{table_name}', df)
+
+
+def _partitions(tasks):
+    # (clean state, year, quarter) of every changed file, per table
+    partitions = {}
+    for dataset, files in tasks:
+        for table_name in ingest.DATASETS[dataset][2]:
+            partitions.setdefault(table_name, set()).update(
+                (names.state_name(state), year, quarter) for state, year, quarter, path in files)
+    return partitions
+
+
+def upsert(cursor, table_name, df, partitions=None):
+    bulkload.create_table(cursor, table_name, df, if_not_exists=True)
+    _stage(cursor, table_name, df)
+
+    target = sql.Identifier(table_name)
+    stage = sql.Identifier(f'stage_{table_name}')
+    columns = sql.SQL(', ').join(map(sql.Identifier, df.columns))
+
+    if table_name in UPSERT_KEYS:
+        match = sql.SQL(' AND ').join(sql.SQL('t.{0} = s.{0}').format(sql.Identifier(key))
+                                      for key in UPSERT_KEYS[table_name])
+        cursor.execute(sql.SQL('DELETE FROM {target} t USING {stage} s WHERE {match}').format(
+            target=target, stage=stage, match=match))
+    else:
+        # replace whole state/year/quarter partitions, so districts that
+        # disappeared from a re-published file disappear here too
+        cursor.execute(sql.SQL('CREATE TEMP TABLE {} (state TEXT, year BIGINT, quarter BIGINT) ON COMMIT DROP').format(
+            sql.Identifier(f'parts_{table_name}')))
+        execute_values(cursor, sql.SQL('INSERT INTO {} VALUES %s').format(
+            sql.Identifier(f'parts_{table_name}')).as_string(cursor), sorted(partitions or []))
+        cursor.execute(sql.SQL('DELETE FROM {target} t USING {parts} p '
+                               'WHERE t.state = p.state AND t.year = p.year AND t.quarter = p.quarter').format(
+            target=target, parts=sql.Identifier(f'parts_{table_name}')))
+
+    cursor.execute(sql.SQL('INSERT INTO {target} ({columns}) SELECT {columns} FROM {stage}').format(
+        target=target, columns=columns, stage=stage))
+    bulkload.create_index(cursor, table_name, df.columns)
+    if _unique(table_name):
+        bulkload.create_unique_index(cursor, table_name, _unique(table_name))
+
+
+def load_incremental(pulse_dir, state_csv=None, workers=None):
+    # parse only new/changed files and fold them into the existing tables
+    mydb = _connect()
+    try:
+        tasks, entries = manifest.scan(pulse_dir, list(ingest.DATASETS), manifest.read_manifest(mydb))
+        frames = clean(ingest.ingest(pulse_dir, workers=workers, tasks=tasks)) if tasks else {}
+        if state_csv:
+            frames['state_loc'] = pd.read_csv(state_csv)
+        if frames:
+            # new states / districts are appended to the existing dimension;
+            # only those and the ones whose coordinates moved are written
+            existing = geo.read_dimensions(mydb)
+            frames = geo.add_dimensions(frames, *existing)
+            for table_name, dim in zip((geo.GEO_STATE, geo.GEO_DISTRICT), existing):
+                frames[table_name] = geo.changed_rows(table_name, frames[table_name], dim)
+
+        partitions = _partitions(tasks)
+        changed = [table_name for table_name, df in frames.items()
+                   if table_name in partitions or (table_name in UPSERT_KEYS and not df.empty)]
+        with mydb.cursor() as cursor:
+            for table_name in changed:
+                upsert(cursor, table_name, frames[table_name], partitions.get(table_name))
+            stale = rollups.for_tables(changed)
+            if stale:
+                rollups.rebuild(cursor, stale)
+            if changed:
+                versions.bump(cursor, changed + stale)
+            manifest.record(cursor, entries)
+        mydb.commit()
+    finally:
+        mydb.close()
+
+    print(f"{sum(len(files) for _, files in tasks)} changed files, tables updated: {', '.join(changed) or 'none'}")
+    return frames
+
+
+def load_postgres(frames):
+    # full rebuild: COPY every table into a staging table and swap them all
+    # in with the rollups in a single transaction
+    mydb = _connect()
+    try:
+        if geo.GEO_STATE not in frames:
+            frames = geo.add_dimensions(frames, *geo.read_dimensions(mydb))
+        with mydb.cursor() as cursor:
+            for table_name, df in frames.items():
+                started = time.perf_counter()
+                bulkload.replace_table(cursor, table_name, df, unique=_unique(table_name))
+                print(f"  {table_name}: {len(df)} rows in {time.perf_counter() - started:.2f}s")
+            rollups.rebuild(cursor)
+            versions.bump(cursor, list(frames) + list(rollups.ROLLUPS))
+        mydb.commit()
+    finally:
+        mydb.close()
+
+
+def _record_all(pulse_dir):
+    # after a full rebuild every file on disk is loaded
+    mydb = _connect()
+    try:
+        tasks, entries = manifest.scan(pulse_dir, list(ingest.DATASETS), {})
+        with mydb.cursor() as cursor:
+            cursor.execute(manifest.CREATE_MANIFEST)
+            manifest.record(cursor, entries)
+        mydb.commit()
+    finally:
+        mydb.close()
+
+
+def existing_dimensions(from_postgres=True):
+    # (geo_state, geo_district) the store already has, or (None, None): a
+    # full rebuild extends them, so every state / district keeps its ID
+    if not from_postgres:
+        try:
+            return snapshot.read_table(geo.GEO_STATE), snapshot.read_table(geo.GEO_DISTRICT)
+        except FileNotFoundError:
+            return None, None
+    mydb = _connect()
+    try:
+        return geo.read_dimensions(mydb)
+    finally:
+        mydb.close()
+
+
+def read_postgres():
+    engine = create_engine(config.DB_URL)
+    table_names = [table_name for dataset in ingest.DATASETS.values() for table_name in dataset[2]] + ['state_loc', *geo.KEYS]
+    return {table_name: pd.read_sql_table(table_name, engine) for table_name in table_names
+            if inspect(engine).has_table(table_name)}
+
+
+def write_snapshot(frames):
+    frames = dict(frames)
+    if geo.GEO_STATE not in frames:
+        frames = geo.add_dimensions(frames)
+    for name, (source, keys, measures) in rollups.ROLLUPS.items():
+        if source in frames:
+            frames[name] = rollups.build_frame(name, frames[source])
+    changed = snapshot.write_snapshot(frames)
+    print(f"snapshot: new versions of {', '.join(changed) or 'no tables'}")
+    return changed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Load the PhonePe Pulse data into the dashboard store.')
+    parser.add_argument('pulse_dir', help='checkout of https://github.com/PhonePe/pulse')
+    parser.add_argument('--state-csv', help='state_latlong.csv (state, latitude, longitude) for state_loc')
+    parser.add_argument('--workers', type=int, default=None, help='parser processes (default: all cores)')
+    parser.add_argument('--snapshot', action='store_true', help='also write the Arrow snapshot')
+    parser.add_argument('--no-postgres', action='store_true', help='skip the Postgres load')
+    parser.add_argument('--full', action='store_true', help='re-parse every file and replace every table')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.full or args.no_postgres:
+        frames = clean(ingest.ingest(args.pulse_dir, workers=args.workers))
+        print(f"parsed {sum(len(df) for df in frames.values())} rows in {time.perf_counter() - started:.1f}s "
+              f"({ingest.JSON_PARSER})")
+        if args.state_csv:
+            frames['state_loc'] = pd.read_csv(args.state_csv)
+        if args.no_postgres:
+            existing = existing_dimensions(from_postgres=False) if args.snapshot else (None, None)
+        else:
+            existing = existing_dimensions()
+        frames = geo.add_dimensions(frames, *existing)
+        if not args.no_postgres:
+            load_postgres(frames)
+            _record_all(args.pulse_dir)
+    else:
+        load_incremental(args.pulse_dir, args.state_csv, args.workers)
+
+    if args.snapshot:
+        # the snapshot is always a full copy of the current tables
+        write_snapshot(frames if args.full or args.no_postgres else read_postgres())
+    print(f"done in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
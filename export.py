@@ -0,0 +1,306 @@
+import argparse
+import html
+import io
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pydeck as pdk
+from matplotlib.figure import Figure
+
+import analytics
+import config
+import data
+import db
+import insights
+import names
+import versions
+from formatting import indian_number, indian_rupees
+
+
+# Static copy of the dashboard for reports and a public mirror:
+#
+#     python export.py out/ [--per-state] [--workers N] [--force]
+#
+# writes one page per tab x year x quarter (x state with --per-state) with
+# the view's totals, top-10 tables, pie chart and map, plus the ten Insights
+# charts, all as plain HTML / PNG a CDN can serve as is:
+#
+#     out/<tab>/<year>/Q<quarter>/<all|state>/index.html (+ map.html, pie.png)
+#     out/insights/<n>.html, <n>.png
+#     out/index.html
+#
+# Views are rendered on a process pool, one view per task. The tables the
+# views read are loaded once, in this process, and the workers are forked
+# from it afterwards: they share the frames copy-on-write instead of each
+# fetching every table again. The pool's idle connections are closed before
+# the fork, so no worker inherits (and talks over) one of this process's
+# server sessions; a worker that does query opens its own. Where fork is not
+# available (Windows) each worker loads the tables it renders itself.
+#
+# out/export.json records the data versions (versions.py) each view was
+# rendered from; a view whose tables have not changed since is skipped, so
+# re-running after an ETL load only redraws what the load touched. Stores
+# without version records re-render everything.
+#
+# The maps use pydeck's default Carto basemap, which needs no Mapbox token.
+
+# bumped when the pages change, so every view is rendered again
+EXPORT_FORMAT = 1
+
+MANIFEST = 'export.json'
+
+# tab -> (options table, totals table, total metrics, top-10 panels
+#         as (label, table, group by, metric), map kind, tables it reads)
+TABS = {
+    'insurance': ('aggregated_insurance', 'aggregated_insurance', ['count', 'amount'],
+                  [('State', 'aggregated_insurance', 'state', 'amount'),
+                   ('District', 'top_insurance_district', 'district', 'amount'),
+                   ('Pincode', 'top_insurance_pincode', 'pincode', 'amount')],
+                  'insurance',
+                  ['aggregated_insurance', 'top_insurance_district', 'top_insurance_pincode', 'geo_state']),
+    'transaction': ('aggregated_transaction', 'aggregated_transaction', ['transaction_count', 'transaction_amount'],
+                    [('State', 'aggregated_transaction', 'state', 'transaction_amount'),
+                     ('District', 'top_transaction_district', 'district', 'amount'),
+                     ('Pincode', 'top_transaction_pincode', 'pincode', 'amount')],
+                    'transaction',
+                    ['aggregated_transaction', 'top_transaction_district', 'top_transaction_pincode', 'map_trans',
+                     'geo_district']),
+    'user': ('aggregated_user', 'map_user', ['registeredusers', 'appopens'],
+             [('State', 'map_user', 'state', 'registeredusers'),
+              ('District', 'top_user_district', 'name', 'registeredusers'),
+              ('Pincode', 'top_user_pincode', 'pincode', 'registeredusers')],
+             'user',
+             ['aggregated_user', 'map_user', 'top_user_district', 'top_user_pincode', 'geo_district']),
+}
+
+# map kind -> (elevation, radius, colour, tooltip), as in stream.py
+MAP_STYLES = {
+    'insurance': ('count', 40000, [255, 192, 203, 255],
+                  'State <b>{state}</b> </br> Policy Count <b>{count}</b> </br> Premium Amount in Rs <b>{amount}</b>'),
+    'transaction': ('count/10000', 7000, [255, 192, 203, 245],
+                    'State <b>{state}</b> </br> District <b>{district}</b> </br> Transaction Count <b>{count}</b> '
+                    '</br> Transaction Amount in Rs<b>{amount}</b>'),
+    'user': ('users/100', 7000, [206, 147, 216, 255],
+             'State <b>{state}</b> </br> District <b>{district}</b> </br> Registered Users <b>{users}</b>'
+             '</br> App Opens <b>{appopens}</b>'),
+}
+
+_SLUGS = {name: slug for slug, name in names.STATE_NAMES.items()}
+
+
+### views
+
+def state_slug(state):
+    if state is None:
+        return 'all'
+    return _SLUGS.get(state) or re.sub(r'[^a-z0-9]+', '-', state.lower()).strip('-')
+
+
+def enumerate_views(per_state=False):
+    # -> [(view key, view)], view = ('tab', tab, year, quarter, state) or ('insights', n)
+    views = []
+    for tab, (options_table, *_) in TABS.items():
+        states = [None] + (sorted(analytics.options(options_table, 'state')) if per_state else [])
+        for year in sorted(analytics.options(options_table, 'year')):
+            for quarter in sorted(analytics.options(options_table, 'quarter')):
+                for state in states:
+                    views.append((f'{tab}/{year}/Q{quarter}/{state_slug(state)}', ('tab', tab, year, quarter, state)))
+    for number in range(1, len(insights.QUESTIONS) + 1):
+        views.append((f'insights/{number}', ('insights', number)))
+    return views
+
+
+def tables_for(view):
+    if view[0] == 'insights':
+        return list(insights.tables_for(list(insights.QUESTIONS)[view[1] - 1]))
+    return TABS[view[1]][5]
+
+
+def stamp(view, published):
+    # what the view was rendered from; None (always render) without versions
+    if published is None:
+        return None
+    return [EXPORT_FORMAT] + [published.get(table_name) for table_name in tables_for(view)]
+
+
+### rendering (runs in the worker processes)
+
+def _write(path, content):
+    # temp file + rename, so a CDN never picks up half a file
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, staging = tempfile.mkstemp(prefix='.export-', dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(content if isinstance(content, bytes) else content.encode())
+    os.replace(staging, path)
+
+
+def _page(title, body):
+    return (f'<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>{html.escape(title)}</title></head>\n'
+            f'<body>\n<h1>{html.escape(title)}</h1>\n{body}\n</body></html>\n')
+
+
+def _table(df):
+    return df.to_html(index=False, border=0, escape=True)
+
+
+def _map_html(kind, points):
+    elevation, radius, colour, tooltip = MAP_STYLES[kind]
+    view = pdk.data_utils.compute_view(points[['longitude', 'latitude']])
+    view.pitch = 75
+    view.bearing = 60
+    view.zoom = 4
+    layer = pdk.Layer('ColumnLayer', data=points, get_position=['longitude', 'latitude'], get_elevation=elevation,
+                      elevation_scale=10, radius=radius, get_fill_color=colour, pickable=True, auto_highlight=True)
+    deck = pdk.Deck(layer, initial_view_state=view, map_style=pdk.map_styles.DARK,
+                    tooltip={'html': tooltip, 'style': {'background': 'grey', 'color': 'white'}})
+    return deck.to_html(as_string=True, notebook_display=False)
+
+
+def _pie_png(categories):
+    fig = Figure(figsize=(8, 6))
+    ax = fig.add_subplot()
+    wedges, texts = ax.pie(categories['transaction_amount'], startangle=90)
+    ax.legend(wedges, categories['transaction_type'], title='Transaction_Type', loc='center left',
+              bbox_to_anchor=(1, 0, 0.5, 1))
+    ax.axis('equal')
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format='png', bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def render_tab(out_dir, tab, year, quarter, state):
+    options_table, totals_table, metrics, panels, kind, tables = TABS[tab]
+    directory = os.path.join(out_dir, tab, str(year), f'Q{quarter}', state_slug(state))
+    year, quarter = [year], [quarter]
+    states = sorted(analytics.options(options_table, 'state')) if state is None else [state]
+    title = f"{tab.title()} - {year[0]} Q{quarter[0]} - {state or 'All states'}"
+
+    totals = analytics.total(totals_table, metrics, year, quarter, states)
+    body = ['<h2>Totals</h2><ul>']
+    for metric in metrics:
+        value = indian_rupees(totals[metric]) if 'amount' in metric else indian_number([totals[metric]], 0, symbol='')[0]
+        body.append(f"<li>{html.escape(metric.replace('_', ' ').title())}: {html.escape(value)}</li>")
+    body.append('</ul>')
+
+    if tab == 'transaction':
+        categories = analytics.group('aggregated_transaction', 'transaction_type', 'transaction_amount',
+                                     year=year, quarter=quarter, state=states, order='metric')
+        if not categories.empty:
+            _write(os.path.join(directory, 'pie.png'), _pie_png(categories))
+            body.append('<h2>Transaction Categories</h2><img src="pie.png" alt="Transaction categories">')
+            body.append(_table(categories.assign(transaction_amount=indian_number(categories['transaction_amount']))
+                               .rename(columns=str.title)))
+    if tab == 'user':
+        brands = analytics.group('aggregated_user', 'brand', 'devicecount',
+                                 year=year, quarter=quarter, state=states, order='metric')
+        body.append('<h2>User Device</h2>' + _table(brands.rename(columns=str.title)))
+
+    for label, table, by, metric in panels:
+        top = analytics.ranked(analytics.top_k(table, by, metric, year, quarter, states))
+        body.append(f'<h2>Top 10 {label}</h2>' + _table(top))
+
+    points = analytics.map_points(kind, year, quarter, states)
+    if points.empty:
+        body.append('<p>Data not available for this Year / Quarter / State.</p>')
+    else:
+        _write(os.path.join(directory, 'map.html'), _map_html(kind, points))
+        body.append('<h2>Map</h2><iframe src="map.html" width="100%" height="520" frameborder="0"></iframe>')
+
+    _write(os.path.join(directory, 'index.html'), _page(title, '\n'.join(body)))
+
+
+def render_insight(out_dir, number, fmt='png'):
+    question = list(insights.QUESTIONS)[number - 1]
+    directory = os.path.join(out_dir, 'insights')
+    _write(os.path.join(directory, f'{number}.{fmt}'), insights.chart(question, fmt))
+    body = f'<img src="{number}.{fmt}" alt="{html.escape(question)}">'
+    if question != insights.STATE_COMPARISON:
+        body = _table(insights.answer(question)) + body
+    _write(os.path.join(directory, f'{number}.html'), _page(question, body))
+
+
+def render(out_dir, view):
+    if view[0] == 'insights':
+        render_insight(out_dir, view[1])
+    else:
+        render_tab(out_dir, *view[1:])
+
+
+### batch
+
+def read_manifest(out_dir):
+    try:
+        with open(os.path.join(out_dir, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write_index(out_dir, keys):
+    links = '\n'.join(f'<li><a href="{html.escape(key)}{".html" if key.startswith("insights/") else "/index.html"}">'
+                      f'{html.escape(key)}</a></li>' for key in sorted(keys))
+    _write(os.path.join(out_dir, 'index.html'), _page('Phonepe Pulse', f'<ul>\n{links}\n</ul>'))
+
+
+def export(out_dir, per_state=False, workers=None, force=False):
+    # -> (rendered, skipped, failed) view counts
+    published = versions.read_versions()
+    views = enumerate_views(per_state)
+    manifest = {} if force else read_manifest(out_dir)
+    todo = [(key, view) for key, view in views
+            if stamp(view, published) is None or manifest.get(key) != stamp(view, published)]
+
+    if todo and not analytics.sql_mode():
+        needed = sorted({table_name for key, view in todo for table_name in tables_for(view)})
+        data.load_tables(needed)
+        for kind in sorted({TABS[view[1]][4] for key, view in todo if view[0] == 'tab'}):
+            analytics.map_rows(kind)
+    if config.BACKEND == 'postgres':
+        db.get_pool().closeall()
+
+    failed = 0
+    try:
+        if workers == 1:
+            for key, view in todo:
+                render(out_dir, view)
+                manifest[key] = stamp(view, published)
+        else:
+            start_method = 'fork' if 'fork' in multiprocessing.get_all_start_methods() else None
+            with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as executor:
+                futures = {executor.submit(render, out_dir, view): (key, view) for key, view in todo}
+                for future in as_completed(futures):
+                    key, view = futures[future]
+                    try:
+                        future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f'  {key}: {type(e).__name__}: {e}')
+                    else:
+                        manifest[key] = stamp(view, published)
+    finally:
+        # views rendered before a failure are not redone next time
+        _write(os.path.join(out_dir, MANIFEST), json.dumps(manifest, indent=1, sort_keys=True))
+    _write_index(out_dir, [key for key, view in views])
+    return len(todo) - failed, len(views) - len(todo), failed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export every dashboard view as static HTML / PNG.')
+    parser.add_argument('out_dir')
+    parser.add_argument('--per-state', action='store_true', help='also one page per state')
+    parser.add_argument('--workers', type=int, default=None, help='render processes (default: all cores)')
+    parser.add_argument('--force', action='store_true', help='render every view, changed or not')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rendered, skipped, failed = export(args.out_dir, args.per_state, args.workers, args.force)
+    print(f"{rendered} views rendered, {skipped} unchanged, {failed} failed in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+
+# Indian digit grouping (last three digits, then pairs: 1,23,45,678.00)
+# without the locale module. locale.setlocale() is process-global, so
+# switching it per value is both slow and unsafe with concurrent sessions.
+# Works on whole arrays / Series: the loop below runs once per digit group,
+# not once per value.
+
+RUPEE = '₹'
+
+# every digit group is < 1000, so group -> text is a table lookup
+_PLAIN = np.array([str(i) for i in range(1000)], dtype=object)
+_PADDED_2 = np.array([f'{i:02d}' for i in range(1000)], dtype=object)
+_PADDED_3 = np.array([f'{i:03d}' for i in range(1000)], dtype=object)
+
+
+def _digit_groups(whole):
+    # least significant first: the last three digits, then pairs
+    groups = [whole % 1000]
+    rest = whole // 1000
+    while rest.any():
+        groups.append(rest % 100)
+        rest = rest // 100
+    return groups
+
+
+def indian_number(values, decimals=2, symbol=RUPEE):
+    is_series = isinstance(values, pd.Series)
+    array = np.asarray(values, dtype=np.float64)
+    shape = array.shape
+    array = array.ravel()
+
+    missing = ~np.isfinite(array)
+    scale = 10 ** decimals
+    # rounded like '%.2f' rounds the exact value. Whole and fractional parts
+    # are split before scaling, since x * 100 of a large amount is already
+    # rounded; the few values that still land within a hair of a tie (0.005
+    # is really 0.00500000000000000010) are settled by formatting them
+    magnitude = np.abs(np.where(missing, 0, array))
+    whole = np.floor(magnitude)
+    scaled = (magnitude - whole) * scale
+    fraction = np.round(scaled)
+    carry = fraction >= scale
+    whole = (whole + carry).astype(np.int64)
+    fraction = np.where(carry, 0, fraction).astype(np.int64)
+    for i in np.flatnonzero(np.abs(scaled - np.floor(scaled) - 0.5) < 1e-6):
+        integral, _, decimal = f'{magnitude[i]:.{decimals}f}'.partition('.')
+        whole[i], fraction[i] = int(integral), int(decimal or 0)
+
+    groups = _digit_groups(whole)
+    # index of the leading (unpadded) group of each value
+    lead = np.zeros(len(whole), dtype=np.int64)
+    for level in range(1, len(groups)):
+        lead[whole >= 1000 * 100 ** (level - 1)] = level
+
+    text = np.full(len(whole), '', dtype=object)
+    for level in range(len(groups) - 1, -1, -1):
+        padded = (_PADDED_3 if level == 0 else _PADDED_2)[groups[level]]
+        text = np.where(level > lead, text,
+                        np.where(level == lead, _PLAIN[groups[level]], text + ',' + padded))
+    if decimals:
+        text = text + '.' + np.array([f'{i:0{decimals}d}' for i in range(scale)], dtype=object)[fraction]
+
+    # from the rounded value, so -0.001 is 0.00 and not -0.00
+    sign = np.where((array < 0) & ((whole > 0) | (fraction > 0)), '-', '').astype(object)
+    text = sign + symbol + text
+    text[missing] = ''
+    text = text.reshape(shape)
+    return pd.Series(text, index=values.index, name=values.name) if is_series else text
+
+
+def indian_rupees(amount, decimals=2):
+    # single value -> str
+    return indian_number([amount], decimals)[0]
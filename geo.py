@@ -0,0 +1,167 @@
+import numpy as np
+import pandas as pd
+from psycopg2 import sql
+
+import ingest
+from names import DISTRICT_COLUMNS
+
+
+# Geographic dimension tables with integer surrogate keys:
+#
+#     geo_state    (state_id, state, latitude, longitude)
+#     geo_district (district_id, state_id, district_key, district, latitude, longitude)
+#
+# The ETL adds a state_id column to every fact table, and a district_id to
+# the district-level ones. The dashboard's map joins then compare integers
+# instead of the notebook's state+district `new_label` strings. Districts
+# are matched on a normalized key (lower case, letters and digits only, no
+# trailing "district"), so a name spelled differently in two datasets still
+# joins instead of silently dropping out of the map.
+#
+# IDs are stable across runs: the ETL passes the store's existing dimension
+# in, on incremental and --full runs alike, and it is extended, never
+# renumbered. A state or district that drops out of the data keeps its row.
+
+GEO_STATE = 'geo_state'
+GEO_DISTRICT = 'geo_district'
+
+# dimension table -> surrogate key column
+KEYS = {GEO_STATE: 'state_id', GEO_DISTRICT: 'district_id'}
+
+STATE_COLUMNS = ['state_id', 'state', 'latitude', 'longitude']
+DISTRICT_DIM_COLUMNS = ['district_id', 'state_id', 'district_key', 'district', 'latitude', 'longitude']
+
+
+def district_key(names):
+    # normalized on the distinct names only, then expanded back
+    codes, uniques = pd.factorize(pd.Series(names, dtype=object).astype(str), use_na_sentinel=False)
+    keys = (pd.Series(uniques, dtype=object).str.lower()
+            .str.replace(r'\s+district$', '', regex=True)
+            .str.replace(r'[^a-z0-9]', '', regex=True))
+    return keys.to_numpy(dtype=object)[codes]
+
+
+def _next_id(dim, column):
+    return int(dim[column].max()) + 1 if len(dim) else 1
+
+
+def _set_coordinates(dim, keys, coordinates):
+    # overwrite latitude / longitude for the rows whose `keys` appear in `coordinates`
+    located = dim[keys].merge(coordinates, on=keys, how='left')
+    found = located['latitude'].notna().to_numpy()
+    dim.loc[found, 'latitude'] = located.loc[found, 'latitude'].to_numpy()
+    dim.loc[found, 'longitude'] = located.loc[found, 'longitude'].to_numpy()
+    return dim
+
+
+def build_states(frames, states=None):
+    states = pd.DataFrame(columns=STATE_COLUMNS) if states is None else states[STATE_COLUMNS].copy()
+    names = set()
+    for table_name, df in frames.items():
+        if table_name in ingest.SCHEMAS or table_name == 'state_loc':
+            names.update(df['state'].dropna().astype(str).unique())
+
+    new = sorted(names - set(states['state']))
+    start = _next_id(states, 'state_id')
+    added = pd.DataFrame({'state_id': np.arange(start, start + len(new), dtype=np.int64), 'state': new,
+                          'latitude': np.nan, 'longitude': np.nan})
+    states = pd.concat([states, added], ignore_index=True) if len(states) else added
+
+    if 'state_loc' in frames:
+        coordinates = frames['state_loc'][['state', 'latitude', 'longitude']].drop_duplicates('state')
+        states = _set_coordinates(states, ['state'], coordinates.astype({'state': str}))
+    return states.astype({'state_id': np.int64, 'latitude': np.float64, 'longitude': np.float64})
+
+
+def _state_ids(states, values):
+    lookup = pd.Series(states['state_id'].to_numpy(), index=states['state'].to_numpy())
+    return lookup.reindex(pd.Series(values, dtype=object).astype(str).to_numpy()).to_numpy()
+
+
+def build_districts(frames, states, districts=None):
+    districts = (pd.DataFrame(columns=DISTRICT_DIM_COLUMNS) if districts is None
+                 else districts[DISTRICT_DIM_COLUMNS].copy())
+    seen = []
+    for table_name, column in DISTRICT_COLUMNS.items():
+        if table_name in frames:
+            df = frames[table_name]
+            seen.append(pd.DataFrame({'state_id': _state_ids(states, df['state']),
+                                      'district_key': district_key(df[column]),
+                                      'district': df[column].astype(str).to_numpy()}))
+    if not seen:
+        return districts
+
+    seen = pd.concat(seen, ignore_index=True).drop_duplicates(['state_id', 'district_key'])
+    new = seen.merge(districts[['state_id', 'district_key']], on=['state_id', 'district_key'],
+                     how='left', indicator=True)
+    new = new[new['_merge'] == 'left_only'].drop(columns='_merge')
+    new = new.sort_values(['state_id', 'district_key'], kind='stable').reset_index(drop=True)
+    start = _next_id(districts, 'district_id')
+    new.insert(0, 'district_id', np.arange(start, start + len(new), dtype=np.int64))
+    new['latitude'] = np.nan
+    new['longitude'] = np.nan
+    districts = pd.concat([districts, new[DISTRICT_DIM_COLUMNS]], ignore_index=True) if len(districts) else new
+
+    if 'map_insurance' in frames:
+        map_ins = frames['map_insurance']
+        coordinates = pd.DataFrame({'state_id': _state_ids(states, map_ins['state']),
+                                    'district_key': district_key(map_ins['label']),
+                                    'latitude': map_ins['lat'].to_numpy(np.float64),
+                                    'longitude': map_ins['lng'].to_numpy(np.float64)})
+        districts = _set_coordinates(districts, ['state_id', 'district_key'],
+                                     coordinates.drop_duplicates(['state_id', 'district_key']))
+    return districts.astype({'district_id': np.int64, 'state_id': np.int64,
+                             'latitude': np.float64, 'longitude': np.float64})
+
+
+def attach(frames, states, districts):
+    # add state_id / district_id to the fact tables
+    district_ids = pd.Series(districts['district_id'].to_numpy(),
+                             index=pd.MultiIndex.from_frame(districts[['state_id', 'district_key']]))
+    for table_name, df in frames.items():
+        if table_name not in ingest.SCHEMAS:
+            continue
+        df['state_id'] = _state_ids(states, df['state']).astype(np.int64)
+        if table_name in DISTRICT_COLUMNS:
+            keys = pd.MultiIndex.from_arrays([df['state_id'].to_numpy(), district_key(df[DISTRICT_COLUMNS[table_name]])])
+            df['district_id'] = district_ids.reindex(keys).to_numpy().astype(np.int64)
+    return frames
+
+
+def add_dimensions(frames, states=None, districts=None):
+    # frames + geo_state / geo_district, extending the given existing dimensions
+    frames = dict(frames)
+    states = build_states(frames, states)
+    districts = build_districts(frames, states, districts)
+    frames = attach(frames, states, districts)
+    frames[GEO_STATE] = states
+    frames[GEO_DISTRICT] = districts
+    return frames
+
+
+def changed_rows(table_name, dim, existing=None):
+    # rows of an extended dimension that are new or whose coordinates moved,
+    # i.e. all an incremental load has to write back
+    if existing is None:
+        return dim
+    key = KEYS[table_name]
+    added = ~dim[key].isin(existing[key]).to_numpy()
+    old = (existing.set_index(key)[['latitude', 'longitude']].reindex(dim[key])
+           .to_numpy().astype(np.float64))
+    new = dim[['latitude', 'longitude']].to_numpy(np.float64)
+    moved = ~((old == new) | (np.isnan(old) & np.isnan(new))).all(axis=1)
+    return dim[added | moved].reset_index(drop=True)
+
+
+def read_dimensions(conn):
+    # existing (geo_state, geo_district) from the database, None if not built yet
+    dims = []
+    with conn.cursor() as cursor:
+        for table_name, columns in ((GEO_STATE, STATE_COLUMNS), (GEO_DISTRICT, DISTRICT_DIM_COLUMNS)):
+            cursor.execute('SELECT to_regclass(%s)', (table_name,))
+            if cursor.fetchone()[0] is None:
+                return None, None
+            cursor.execute(sql.SQL('SELECT {} FROM {}').format(
+                sql.SQL(', ').join(map(sql.Identifier, columns)), sql.Identifier(table_name)))
+            dims.append(pd.DataFrame(cursor.fetchall(), columns=columns))
+    return tuple(dims)
@@ -0,0 +1,251 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import names
+
+# orjson is in requirements.txt; a checkout without it still parses, only
+# slower, and etl.py says which parser ran
+try:
+    import orjson
+
+    JSON_PARSER = 'orjson'
+
+    def _load_json(path):
+        with open(path, 'rb') as f:
+            return orjson.loads(f.read())
+except ImportError:
+    import json
+
+    JSON_PARSER = 'json'
+
+    def _load_json(path):
+        with open(path, 'rb') as f:
+            return json.load(f)
+
+
+# Reads the PhonePe Pulse JSON tree (https://github.com/PhonePe/pulse) into
+# the twelve dashboard tables. Files are fanned out to a process pool one
+# state directory per task; each task parses its files straight into typed
+# column arrays and ships them back as one batch per table. State and
+# district names are canonicalized (names.py) once the batches are joined.
+
+
+### table schemas (column order matches the tables the notebook wrote)
+
+SCHEMAS = {
+    'aggregated_transaction': {'transaction_type': object, 'transaction_count': np.int64, 'transaction_amount': np.float64},
+    'aggregated_user': {'brand': object, 'devicecount': np.int64, 'percentage': np.float64},
+    'aggregated_insurance': {'count': np.int64, 'amount': np.float64},
+    'map_insurance': {'lat': np.float64, 'lng': np.float64, 'metric': np.float64, 'label': object},
+    'map_trans': {'name': object, 'amount': np.float64, 'count': np.int64},
+    'map_user': {'name': object, 'registeredusers': np.int64, 'appopens': np.int64},
+    'top_insurance_district': {'district': object, 'count': np.int64, 'amount': np.float64},
+    'top_insurance_pincode': {'pincode': object, 'count': np.int64, 'amount': np.float64},
+    'top_transaction_district': {'district': object, 'count': np.int64, 'amount': np.float64},
+    'top_transaction_pincode': {'pincode': object, 'count': np.int64, 'amount': np.float64},
+    'top_user_district': {'name': object, 'registeredusers': np.int64},
+    'top_user_pincode': {'pincode': object, 'registeredusers': np.int64},
+}
+
+KEY_DTYPES = {'state': object, 'year': np.int64, 'quarter': np.int64}
+
+
+### per-file parsers: JSON document -> {table: {column: values}}
+
+def _column(values, dtype):
+    if dtype is object:
+        return np.array(values, dtype=object)
+    # missing metrics come through as None; store them as 0
+    return np.fromiter((0 if v is None else v for v in values), dtype=dtype, count=len(values))
+
+
+def _parse_aggregated_transaction(doc):
+    rows = doc['data']['transactionData'] or []
+    return {'aggregated_transaction': {
+        'transaction_type': [r['name'] for r in rows],
+        'transaction_count': [r['paymentInstruments'][0]['count'] for r in rows],
+        'transaction_amount': [r['paymentInstruments'][0]['amount'] for r in rows]}}
+
+
+def _parse_aggregated_user(doc):
+    rows = doc['data'].get('usersByDevice') or []
+    return {'aggregated_user': {
+        'brand': [r['brand'] for r in rows],
+        'devicecount': [r['count'] for r in rows],
+        'percentage': [r['percentage'] for r in rows]}}
+
+
+def _parse_aggregated_insurance(doc):
+    rows = doc['data']['transactionData'] or []
+    return {'aggregated_insurance': {
+        'count': [r['paymentInstruments'][0]['count'] for r in rows],
+        'amount': [r['paymentInstruments'][0]['amount'] for r in rows]}}
+
+
+def _parse_map_insurance(doc):
+    rows = doc['data']['data']['data'] or []
+    return {'map_insurance': {
+        'lat': [r[0] for r in rows],
+        'lng': [r[1] for r in rows],
+        'metric': [r[2] for r in rows],
+        'label': [r[3] for r in rows]}}
+
+
+def _parse_map_transaction(doc):
+    rows = doc['data']['hoverDataList'] or []
+    return {'map_trans': {
+        'name': [r['name'] for r in rows],
+        'amount': [r['metric'][0]['amount'] for r in rows],
+        'count': [r['metric'][0]['count'] for r in rows]}}
+
+
+def _parse_map_user(doc):
+    rows = (doc['data']['hoverData'] or {}).items()
+    return {'map_user': {
+        'name': [name for name, _ in rows],
+        'registeredusers': [r['registeredUsers'] for _, r in rows],
+        'appopens': [r['appOpens'] for _, r in rows]}}
+
+
+def _parse_top_metric(doc, prefix):
+    districts = doc['data']['districts'] or []
+    pincodes = doc['data']['pincodes'] or []
+    return {
+        f'{prefix}_district': {
+            'district': [r['entityName'] for r in districts],
+            'count': [r['metric']['count'] for r in districts],
+            'amount': [r['metric']['amount'] for r in districts]},
+        f'{prefix}_pincode': {
+            'pincode': [r['entityName'] for r in pincodes],
+            'count': [r['metric']['count'] for r in pincodes],
+            'amount': [r['metric']['amount'] for r in pincodes]}}
+
+
+def _parse_top_insurance(doc):
+    return _parse_top_metric(doc, 'top_insurance')
+
+
+def _parse_top_transaction(doc):
+    return _parse_top_metric(doc, 'top_transaction')
+
+
+def _parse_top_user(doc):
+    districts = doc['data']['districts'] or []
+    pincodes = doc['data']['pincodes'] or []
+    return {
+        'top_user_district': {
+            'name': [r['name'] for r in districts],
+            'registeredusers': [r['registeredUsers'] for r in districts]},
+        'top_user_pincode': {
+            'pincode': [r['name'] for r in pincodes],
+            'registeredusers': [r['registeredUsers'] for r in pincodes]}}
+
+
+# dataset -> (directory under <pulse>/data, parser, tables it produces)
+DATASETS = {
+    'aggregated_transaction': ('aggregated/transaction', _parse_aggregated_transaction, ['aggregated_transaction']),
+    'aggregated_user': ('aggregated/user', _parse_aggregated_user, ['aggregated_user']),
+    'aggregated_insurance': ('aggregated/insurance', _parse_aggregated_insurance, ['aggregated_insurance']),
+    'map_insurance': ('map/insurance', _parse_map_insurance, ['map_insurance']),
+    'map_transaction': ('map/transaction/hover', _parse_map_transaction, ['map_trans']),
+    'map_user': ('map/user/hover', _parse_map_user, ['map_user']),
+    'top_insurance': ('top/insurance', _parse_top_insurance, ['top_insurance_district', 'top_insurance_pincode']),
+    'top_transaction': ('top/transaction', _parse_top_transaction, ['top_transaction_district', 'top_transaction_pincode']),
+    'top_user': ('top/user', _parse_top_user, ['top_user_district', 'top_user_pincode']),
+}
+
+
+### file discovery
+
+def state_root(pulse_dir, dataset):
+    return os.path.join(pulse_dir, 'data', DATASETS[dataset][0], 'country', 'india', 'state')
+
+
+def list_files(pulse_dir, dataset):
+    # [(state, year, quarter, path)] for every <state>/<year>/<quarter>.json
+    root = state_root(pulse_dir, dataset)
+    files = []
+    for state in sorted(os.listdir(root)):
+        for year in sorted(os.listdir(os.path.join(root, state))):
+            year_dir = os.path.join(root, state, year)
+            for name in sorted(os.listdir(year_dir)):
+                if name.endswith('.json'):
+                    files.append((state, int(year), int(name[:-len('.json')]), os.path.join(year_dir, name)))
+    return files
+
+
+### workers
+
+def parse_files(dataset, files):
+    # parse a batch of files into one columnar batch per table
+    parser = DATASETS[dataset][1]
+    parts = {}
+    for state, year, quarter, path in files:
+        for table_name, columns in parser(_load_json(path)).items():
+            n = len(next(iter(columns.values())))
+            if not n:
+                continue
+            schema = SCHEMAS[table_name]
+            part = {'state': np.full(n, state, dtype=object),
+                    'year': np.full(n, year, dtype=np.int64),
+                    'quarter': np.full(n, quarter, dtype=np.int64)}
+            for column, values in columns.items():
+                part[column] = _column(values, schema[column])
+            parts.setdefault(table_name, []).append(part)
+
+    return {table_name: _concat(table_name, table_parts) for table_name, table_parts in parts.items()}
+
+
+def _concat(table_name, parts):
+    columns = list(KEY_DTYPES) + list(SCHEMAS[table_name])
+    return {column: np.concatenate([part[column] for part in parts]) for column in columns}
+
+
+def _empty_batch(table_name):
+    dtypes = dict(KEY_DTYPES, **SCHEMAS[table_name])
+    return {column: np.empty(0, dtype=dtype) for column, dtype in dtypes.items()}
+
+
+def group_tasks(dataset, files):
+    # one task per dataset x state directory
+    by_state = {}
+    for entry in files:
+        by_state.setdefault(entry[0], []).append(entry)
+    return [(dataset, state_files) for state_files in by_state.values()]
+
+
+def _tasks(pulse_dir, datasets):
+    for dataset in datasets:
+        yield from group_tasks(dataset, list_files(pulse_dir, dataset))
+
+
+def ingest(pulse_dir, datasets=None, workers=None, tasks=None):
+    # parse the Pulse tree into frames, one per table, with canonical names
+    datasets = list(datasets or DATASETS)
+    tasks = list(tasks if tasks is not None else _tasks(pulse_dir, datasets))
+
+    batches = {table_name: [] for dataset in datasets for table_name in DATASETS[dataset][2]}
+    if workers == 1:
+        results = (parse_files(dataset, files) for dataset, files in tasks)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        results = executor.map(parse_files, *zip(*tasks)) if tasks else iter(())
+
+    try:
+        for result in results:
+            for table_name, batch in result.items():
+                batches[table_name].append(batch)
+    finally:
+        if workers != 1:
+            executor.shutdown()
+
+    frames = {}
+    for table_name, table_batches in batches.items():
+        table_batches = table_batches or [_empty_batch(table_name)]
+        columns = list(KEY_DTYPES) + list(SCHEMAS[table_name])
+        df = pd.DataFrame({column: np.concatenate([b[column] for b in table_batches]) for column in columns})
+        frames[table_name] = names.canonicalize(table_name, df)
+    return frames
@@ -0,0 +1,142 @@
+import io
+
+import pandas as pd
+from matplotlib.figure import Figure
+
+import analytics
+import cache
+import config
+import instrument
+
+
+# The Insights tab's predefined questions. Each answer is a small table
+# plus a bar chart; both depend only on the data, so they are computed and
+# rendered once per data version and then served from a bounded cache.
+#
+# Charts are drawn on explicit Figure objects (no pyplot), so concurrent
+# sessions never share pyplot's global "current figure".
+
+
+### question -> (table, group by, metric, aggregate, x label, y label, title)
+
+QUESTIONS = {
+    '1. Quarter Wise Insuarance performance for the years 2020, 2021, 2022, 2023?':
+        ('aggregated_insurance', 'quarter', 'count', 'sum',
+         'Quarters', 'Insurance Count in Lakhs', 'Quarterly Insurance Performance for Years (2020-2023)'),
+    '2. Show the Year Wise[2020,2021,2022,2023] Insurance Performance?':
+        ('aggregated_insurance', 'year', 'count', 'sum',
+         'Year', 'Insurance Count in Lakhs', 'Year Wise(2020,2021,2022,2023) Insurance Performance'),
+    '3. Average Permium Amount for the years [2020,2021,2022,2023]?':
+        ('aggregated_insurance', 'year', 'amount', 'mean',
+         'Year', 'Average Insurance Amount in Crore', 'Year Wise(2020,2021,2022,2023) Average Premium Amount'),
+    '4. Quarter Wise Transcation Count for years 2018-2023?':
+        ('map_trans', 'quarter', 'count', 'sum',
+         'Quarters', 'Transaction Count in Ten Billion', 'Quarterly Transaction for Years (2020-2023)'),
+    '5. Show the Year Wise[2018-2023] Transaction Count?':
+        ('map_trans', 'year', 'count', 'sum',
+         'Year', 'Transaction Count in Ten Billion', 'Year Wise(2020,2021,2022,2023) Transaction Count'),
+    '6. Average Transaction Amount for years [2018- 2023]':
+        ('map_trans', 'year', 'amount', 'mean',
+         'Year', 'Average Transaction Amount in Ten Billion', 'Year Wise(2020,2021,2022,2023) Average Transaction Amount'),
+    '7. Show the registered users count for year[2018-2023]':
+        ('map_user', 'year', 'registeredusers', 'sum',
+         'Year', 'Registered Users in Billion', 'Year Wise Registeres Users (2020-2023)'),
+    '8. New Users for the years [2018 - 2023]?':
+        ('map_user', 'year', 'appopens', 'sum',
+         'Year', 'App Opens in Hundered Billion', 'New Users for Years (2020-2023)'),
+    '9. Quarter Wise registered count  for years 2018-2023?':
+        ('map_user', 'quarter', 'registeredusers', 'sum',
+         'Quarter', 'Registered Users in Billion', 'Quater Wise New Users for Years (2020-2023)'),
+    # answered by _state_comparison / _draw_state_comparison
+    '10.State Wise Transaction Count Vs User Count':
+        (None, 'state', None, None,
+         'State', 'Count in Ten Billion', 'State Wise Transaction Count Vs User Count'),
+}
+
+STATE_COMPARISON = '10.State Wise Transaction Count Vs User Count'
+
+FORMATS = {'png': 'image/png', 'svg': 'image/svg+xml'}
+
+_cache = cache.StampedLRU(config.INSIGHTS_CACHE_SIZE)
+
+
+def tables_for(question):
+    table = QUESTIONS[question][0]
+    return ('map_trans', 'map_user') if table is None else (table,)
+
+
+### answers
+
+def _state_comparison():
+    state_trans = analytics.group('map_trans', 'state', 'count')
+    state_user = analytics.group('map_user', 'state', 'registeredusers')
+    return pd.merge(state_trans, state_user, on='state')
+
+
+def _compute_answer(question):
+    if question == STATE_COMPARISON:
+        return _state_comparison()
+    table, by, metric, agg = QUESTIONS[question][:4]
+    return analytics.ranked(analytics.group(table, by, metric, agg=agg))
+
+
+def answer(question):
+    # S.No / key / metric table for the question (shared: do not modify it)
+    return _cache.get(('answer', question), analytics.stamp(*tables_for(question)),
+                      lambda: _compute_answer(question))
+
+
+### charts
+
+def _draw_bars(fig, question, df):
+    xlabel, ylabel, title = QUESTIONS[question][4:]
+    key, value = df.columns[1], df.columns[2]
+    ax = fig.add_subplot()
+    ax.bar(df[key], df[value], color='purple')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xticks(df[key])
+    ax.grid(axis='y')
+
+
+def _draw_state_comparison(fig, question, df):
+    xlabel, ylabel, title = QUESTIONS[question][4:]
+    ax = fig.add_subplot()
+    bar_width = 0.4
+    index = range(len(df))
+    ax.bar(index, df['count'], width=bar_width, label='Transaction Count', color='purple')
+    ax.bar([i + bar_width for i in index], df['registeredusers'], width=bar_width, label='User Count', color='orange')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    ax.set_title(title)
+    ax.set_xticks([i + bar_width / 2 for i in index])
+    # rotated for readability
+    ax.set_xticklabels(df['state'], rotation=90, ha='right')
+    ax.legend()
+
+
+@instrument.timed('insights.render')
+def _render(question, fmt):
+    df = answer(question)
+    if question == STATE_COMPARISON:
+        fig = Figure(figsize=(12, 8))
+        _draw_state_comparison(fig, question, df)
+    else:
+        fig = Figure(figsize=(10, 5), dpi=100)
+        _draw_bars(fig, question, df)
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format=fmt, bbox_inches='tight')
+    return buffer.getvalue()
+
+
+def chart(question, fmt='png'):
+    # rendered chart as PNG / SVG bytes
+    if fmt not in FORMATS:
+        raise ValueError(f"unsupported chart format '{fmt}' (expected one of {', '.join(FORMATS)})")
+    return _cache.get(('chart', question, fmt), analytics.stamp(*tables_for(question)),
+                      lambda: _render(question, fmt))
+
+
+def cache_info():
+    return _cache.stats()
@@ -0,0 +1,146 @@
+import contextvars
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import config
+
+
+# Lightweight timing spans for the dashboard. A span records its wall time
+# and the rows fetched inside it (db.read_frame / table loads report them
+# with add_rows), and is folded into process-wide totals per span name.
+#
+# Each Streamlit rerun runs in its own script thread; start_trace() gives
+# that run a list of its spans for the debug panel. Spans nest through a
+# context variable, so rows fetched by a query count towards every
+# enclosing span as well.
+#
+# Cost per span is two perf_counter() calls and a dict update under a lock.
+# Exports: prometheus_text() (optionally written to PULSE_METRICS_FILE
+# after every rerun) and, with PULSE_TIMING_LOG=1, one JSON log line per span.
+
+logger = logging.getLogger('pulse.timing')
+
+_trace = contextvars.ContextVar('pulse_trace', default=None)
+_current = contextvars.ContextVar('pulse_span', default=None)
+
+_lock = threading.Lock()
+# span name -> {'count', 'seconds', 'max_seconds', 'rows'}
+_totals = {}
+
+
+@contextmanager
+def span(name):
+    if not config.INSTRUMENT:
+        yield None
+        return
+
+    parent = _current.get()
+    record = {'name': name, 'rows': 0, 'depth': 0 if parent is None else parent['depth'] + 1,
+              '_parent': parent}
+    token = _current.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['seconds'] = time.perf_counter() - started
+        _current.reset(token)
+        _finish(record)
+
+
+def timed(name):
+    # decorator form of span()
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def add_rows(n):
+    record = _current.get()
+    while record is not None:
+        record['rows'] += n
+        record = record['_parent']
+
+
+def _finish(record):
+    del record['_parent']
+    with _lock:
+        totals = _totals.setdefault(record['name'], {'count': 0, 'seconds': 0.0, 'max_seconds': 0.0, 'rows': 0})
+        totals['count'] += 1
+        totals['seconds'] += record['seconds']
+        totals['max_seconds'] = max(totals['max_seconds'], record['seconds'])
+        totals['rows'] += record['rows']
+
+    trace = _trace.get()
+    if trace is not None:
+        trace.append(record)
+    if config.TIMING_LOG:
+        logger.info(json.dumps({'span': record['name'], 'seconds': round(record['seconds'], 6),
+                                'rows': record['rows'], 'depth': record['depth']}))
+
+
+def start_trace():
+    # spans finished from here on in this thread are appended to the
+    # returned list (in completion order, so children come before parents)
+    trace = []
+    _trace.set(trace)
+    return trace
+
+
+def totals():
+    with _lock:
+        return {name: dict(values) for name, values in _totals.items()}
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"')
+
+
+def prometheus_text(table_info=None):
+    # Prometheus text exposition of the span totals, plus the per-table
+    # memory / rows of data.cache_info() when given
+    lines = ['# HELP pulse_span_seconds_total Wall time spent in each dashboard span.',
+             '# TYPE pulse_span_seconds_total counter']
+    span_totals = totals()
+    for name, values in sorted(span_totals.items()):
+        lines.append(f'pulse_span_seconds_total{{span="{_label(name)}"}} {values["seconds"]:.6f}')
+    lines += ['# HELP pulse_span_count_total Times each span ran.', '# TYPE pulse_span_count_total counter']
+    for name, values in sorted(span_totals.items()):
+        lines.append(f'pulse_span_count_total{{span="{_label(name)}"}} {values["count"]}')
+    lines += ['# HELP pulse_span_max_seconds Slowest run of each span.', '# TYPE pulse_span_max_seconds gauge']
+    for name, values in sorted(span_totals.items()):
+        lines.append(f'pulse_span_max_seconds{{span="{_label(name)}"}} {values["max_seconds"]:.6f}')
+    lines += ['# HELP pulse_span_rows_total Rows fetched inside each span.', '# TYPE pulse_span_rows_total counter']
+    for name, values in sorted(span_totals.items()):
+        lines.append(f'pulse_span_rows_total{{span="{_label(name)}"}} {values["rows"]}')
+
+    if table_info:
+        lines += ['# HELP pulse_table_memory_bytes Memory of each cached dashboard table.',
+                  '# TYPE pulse_table_memory_bytes gauge']
+        for table_name, info in sorted(table_info.items()):
+            lines.append(f'pulse_table_memory_bytes{{table="{_label(table_name)}"}} {info["memory_bytes"]}')
+        lines += ['# HELP pulse_table_rows Rows in each cached dashboard table.', '# TYPE pulse_table_rows gauge']
+        for table_name, info in sorted(table_info.items()):
+            lines.append(f'pulse_table_rows{{table="{_label(table_name)}"}} {info["rows"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def write_metrics(table_info=None, path=config.METRICS_FILE):
+    # for node_exporter's textfile collector: written to a temp file and
+    # renamed, so a scrape never reads half a file
+    if not path:
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, staging = tempfile.mkstemp(prefix='.pulse-metrics-', dir=directory)
+    with os.fdopen(fd, 'w') as f:
+        f.write(prometheus_text(table_info))
+    os.replace(staging, path)
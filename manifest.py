@@ -0,0 +1,70 @@
+import hashlib
+import os
+
+from psycopg2.extras import execute_values
+
+import ingest
+
+
+# Record of every Pulse JSON file the ETL has loaded (path, size, mtime,
+# content hash), kept in the database next to the data it describes. A run
+# only re-parses files that are new or whose content changed.
+
+MANIFEST_TABLE = 'etl_manifest'
+
+CREATE_MANIFEST = f'''CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE} (
+    path TEXT PRIMARY KEY,
+    dataset TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    mtime DOUBLE PRECISION NOT NULL,
+    sha256 TEXT NOT NULL,
+    ingested_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)'''
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_manifest(conn):
+    with conn.cursor() as cursor:
+        cursor.execute(CREATE_MANIFEST)
+        cursor.execute(f'SELECT path, size, mtime, sha256 FROM {MANIFEST_TABLE}')
+        return {path: (size, mtime, sha256) for path, size, mtime, sha256 in cursor.fetchall()}
+
+
+def scan(pulse_dir, datasets, known):
+    # -> (files to parse as [(dataset, [(state, year, quarter, path)])],
+    #     manifest rows to write after they are loaded)
+    tasks = []
+    entries = []
+    for dataset in datasets:
+        changed = []
+        for state, year, quarter, path in ingest.list_files(pulse_dir, dataset):
+            key = os.path.relpath(path, pulse_dir).replace(os.sep, '/')
+            stat = os.stat(path)
+            previous = known.get(key)
+            if previous and previous[0] == stat.st_size and previous[1] == stat.st_mtime:
+                continue
+
+            sha256 = file_hash(path)
+            entries.append((key, dataset, stat.st_size, stat.st_mtime, sha256))
+            # touched but identical content: only the stats need updating
+            if previous and previous[2] == sha256:
+                continue
+            changed.append((state, year, quarter, path))
+
+        tasks.extend(ingest.group_tasks(dataset, changed))
+    return tasks, entries
+
+
+def record(cursor, entries):
+    execute_values(cursor, f'''INSERT INTO {MANIFEST_TABLE} (path, dataset, size, mtime, sha256)
+                               VALUES %s
+                               ON CONFLICT (path) DO UPDATE SET
+                                   size = EXCLUDED.size, mtime = EXCLUDED.mtime,
+                                   sha256 = EXCLUDED.sha256, ingested_at = now()''', entries)
@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+# One source of truth for state and district names. The Pulse tree names
+# states by directory slug ('andhra-pradesh') and districts in lower case,
+# often with a ' district' suffix; the dashboard shows the notebook's
+# spellings ('AndhraPradesh', 'Bengaluru Urban').
+#
+# Every rename works on the distinct values of a column: the column is
+# factorized once, the few uniques are rewritten, and the codes are mapped
+# back. That is one pass over the data however many names change, instead
+# of the notebook's one Series.replace() scan per (old, new) pair.
+
+
+STATE_NAMES = {
+    'andaman-&-nicobar-islands': 'Andaman NicobarIslands',
+    'andhra-pradesh': 'AndhraPradesh',
+    'arunachal-pradesh': 'ArunachalPradesh',
+    'assam': 'Assam',
+    'bihar': 'Bihar',
+    'chandigarh': 'Chandigarh',
+    'chhattisgarh': 'Chhattisgarh',
+    'dadra-&-nagar-haveli-&-daman-&-diu': 'Dadra NagarHaveli Daman Diu',
+    'delhi': 'Delhi',
+    'goa': 'Goa',
+    'gujarat': 'Gujarat',
+    'haryana': 'Haryana',
+    'himachal-pradesh': 'HimachalPradesh',
+    'jammu-&-kashmir': 'Jammu Kashmir',
+    'jharkhand': 'Jharkhand',
+    'karnataka': 'Karnataka',
+    'kerala': 'Kerala',
+    'ladakh': 'Ladakh',
+    'lakshadweep': 'Lakshadweep',
+    'madhya-pradesh': 'MadhyaPradesh',
+    'maharashtra': 'Maharashtra',
+    'manipur': 'Manipur',
+    'meghalaya': 'Meghalaya',
+    'mizoram': 'Mizoram',
+    'nagaland': 'Nagaland',
+    'odisha': 'Odisha',
+    'puducherry': 'Puducherry',
+    'punjab': 'Punjab',
+    'rajasthan': 'Rajasthan',
+    'sikkim': 'Sikkim',
+    'tamil-nadu': 'TamilNadu',
+    'telangana': 'Telangana',
+    'tripura': 'Tripura',
+    'uttar-pradesh': 'UttarPradesh',
+    'uttarakhand': 'Uttarakhand',
+    'west-bengal': 'WestBengal',
+}
+
+# tables with a district name -> its column
+DISTRICT_COLUMNS = {
+    'map_insurance': 'label',
+    'map_trans': 'name',
+    'map_user': 'name',
+    'top_insurance_district': 'district',
+    'top_transaction_district': 'district',
+    'top_user_district': 'name',
+}
+
+
+def _rename_distinct(values, rename):
+    # apply `rename` (Index of names -> Index of names) to the uniques only;
+    # categorical input stays categorical, anything else comes back as object
+    values = pd.Series(values)
+    codes, uniques = pd.factorize(values)
+    new_codes, new_names = pd.factorize(rename(pd.Index(uniques, dtype=object)))
+    codes = np.where(codes < 0, -1, new_codes[codes] if len(new_codes) else codes)
+    result = pd.Categorical.from_codes(codes, new_names)
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        result = np.asarray(result, dtype=object)
+    return pd.Series(result, index=values.index, name=values.name)
+
+
+def state_name(slug):
+    return STATE_NAMES.get(slug, slug)
+
+
+def canonical_states(values):
+    return _rename_distinct(values, lambda names: names.map(state_name))
+
+
+def canonical_districts(values):
+    # 'north goa district' -> 'North Goa'
+    return _rename_distinct(values, lambda names: names.str.title().str.replace(' District', ''))
+
+
+def canonicalize(table_name, df):
+    # state and district names of one table, in place
+    if 'state' in df.columns:
+        df['state'] = canonical_states(df['state'])
+    if table_name in DISTRICT_COLUMNS:
+        column = DISTRICT_COLUMNS[table_name]
+        df[column] = canonical_districts(df[column])
+    return df
@@ -0,0 +1,119 @@
+from psycopg2 import sql
+
+
+# Parameterized SQL for the dashboard's filter / aggregate patterns. Every
+# builder returns (query, params) ready for db.read_frame().
+
+AGGREGATES = {'sum': 'SUM', 'mean': 'AVG'}
+
+
+def _plain(values):
+    # multiselect values come back as numpy scalars, which psycopg2 can't adapt
+    return [v.item() if hasattr(v, 'item') else v for v in values]
+
+
+def where(year=None, quarter=None, state=None, table=None):
+    conditions = []
+    params = []
+    for column, values in (('year', year), ('quarter', quarter), ('state', state)):
+        if values is None:
+            continue
+        name = sql.Identifier(table, column) if table else sql.Identifier(column)
+        conditions.append(sql.SQL('{} = ANY(%s)').format(name))
+        params.append(_plain(values))
+
+    if not conditions:
+        return sql.SQL(''), params
+    return sql.SQL(' WHERE ') + sql.SQL(' AND ').join(conditions), params
+
+
+def distinct(table, column):
+    query = sql.SQL('SELECT DISTINCT {col} FROM {table} ORDER BY {col}').format(
+        col=sql.Identifier(column), table=sql.Identifier(table))
+    return query, []
+
+
+def total(table, metrics, year=None, quarter=None, state=None):
+    condition, params = where(year, quarter, state)
+    query = sql.SQL('SELECT {sums} FROM {table}{where}').format(
+        sums=sql.SQL(', ').join(sql.SQL('COALESCE(SUM({m}), 0) AS {m}').format(m=sql.Identifier(m))
+                                for m in metrics),
+        table=sql.Identifier(table),
+        where=condition)
+    return query, params
+
+
+def group(table, by, metric, agg='sum', year=None, quarter=None, state=None,
+          order='key', limit=None, weight=None, ties='first'):
+    condition, params = where(year, quarter, state)
+    by_col = sql.Identifier(by)
+    metric_col = sql.Identifier(metric)
+
+    if agg == 'mean' and weight is not None:
+        # mean over a rollup: total of the metric / total raw rows folded in
+        value = sql.SQL('SUM({})::float8 / NULLIF(SUM({}), 0)').format(metric_col, sql.Identifier(weight))
+    else:
+        value = sql.SQL('{}({})').format(sql.SQL(AGGREGATES[agg]), metric_col)
+
+    with_ties = order == 'metric' and ties == 'all' and limit is not None
+    if with_ties:
+        # WITH TIES compares the whole ORDER BY, so the key must not be in it
+        order_by = sql.SQL('{} DESC').format(metric_col)
+    elif order == 'metric':
+        # ties broken by key so LIMIT always returns the same rows
+        order_by = sql.SQL('{} DESC, {}').format(metric_col, by_col)
+    else:
+        order_by = by_col
+
+    query = sql.SQL('SELECT {by}, {value} AS {metric} FROM {table}{where} '
+                    'GROUP BY {by} ORDER BY {order}').format(
+        by=by_col, value=value, metric=metric_col,
+        table=sql.Identifier(table), where=condition, order=order_by)
+
+    if limit is not None:
+        # FETCH ... WITH TIES needs Postgres 13+
+        query = query + sql.SQL(' FETCH FIRST %s ROWS WITH TIES' if with_ties else ' LIMIT %s')
+        params.append(int(limit))
+    return query, params
+
+
+### map joins (fact table filtered before it is shipped to the dashboard)
+
+# facts joined to the geo dimension on integer surrogate keys (see geo.py);
+# locations without coordinates are left out of the map
+
+MAP_QUERIES = {
+    'insurance': ('aggregated_insurance',
+                  '''select aggregated_insurance.state,aggregated_insurance.year,aggregated_insurance.quarter,aggregated_insurance.count,aggregated_insurance.amount,geo_state.latitude,geo_state.longitude from aggregated_insurance
+                INNER JOIN geo_state ON geo_state.state_id = aggregated_insurance.state_id AND geo_state.latitude IS NOT NULL''',
+                  ['state', 'year', 'quarter', 'count', 'amount', 'latitude', 'longitude']),
+    'transaction': ('map_trans',
+                    '''select map_trans.state,map_trans.year,map_trans.quarter,map_trans.name,map_trans.count,map_trans.amount,geo_district.latitude,geo_district.longitude from map_trans
+                INNER JOIN geo_district ON geo_district.district_id = map_trans.district_id AND geo_district.latitude IS NOT NULL''',
+                    ['state', 'year', 'quarter', 'district', 'count', 'amount', 'latitude', 'longitude']),
+    'user': ('map_user',
+             '''select map_user.state, map_user.year, map_user.quarter, map_user.name, map_user.registeredusers,map_user.appopens, geo_district.latitude, geo_district.longitude from map_user
+                INNER JOIN geo_district ON geo_district.district_id = map_user.district_id AND geo_district.latitude IS NOT NULL''',
+             ['state', 'year', 'quarter', 'district', 'users', 'appopens', 'latitude', 'longitude']),
+}
+
+
+def map_join(kind, year=None, quarter=None, state=None):
+    fact_table, base, columns = MAP_QUERIES[kind]
+    condition, params = where(year, quarter, state, table=fact_table)
+    return sql.SQL(base) + condition, params, columns
+
+
+def map_points(kind, keys, metrics, year=None, quarter=None, state=None):
+    # map_join() summed per location over the selection: one row per point
+    # the map draws instead of one per location and quarter
+    fact_table, base, columns = MAP_QUERIES[kind]
+    condition, params = where(year, quarter, state, table=fact_table)
+    locations = sql.SQL(', ').join(map(sql.Identifier, keys + ['latitude', 'longitude']))
+    query = sql.SQL('SELECT {locations}, {sums} FROM ({join}) AS loc({columns}) '
+                    'GROUP BY {locations} ORDER BY {locations}').format(
+        locations=locations,
+        sums=sql.SQL(', ').join(sql.SQL('SUM({m}) AS {m}').format(m=sql.Identifier(m)) for m in metrics),
+        join=sql.SQL(base) + condition,
+        columns=sql.SQL(', ').join(map(sql.Identifier, columns)))
+    return query, params
@@ -0,0 +1,79 @@
+from psycopg2 import sql
+
+
+# Pre-aggregated copies of the fact tables at state x year x quarter grain
+# (plus transaction_type / brand where the dashboard groups by them). The
+# ETL rebuilds them after every load; analytics.py answers from them
+# whenever the requested grouping and filters are covered by their keys.
+#
+# Each rollup stores SUM() of its measures and the number of raw rows it
+# folds (ROW_COUNT), so means are recovered as SUM(metric) / SUM(n_rows).
+#
+# The district / pincode tables are already stored one row per
+# state x year x quarter x entity, so a rollup would not make them smaller.
+
+ROW_COUNT = 'n_rows'
+
+ROLLUPS = {
+    'rollup_insurance': ('aggregated_insurance',
+                         ['state', 'year', 'quarter'],
+                         ['count', 'amount']),
+    'rollup_transaction_type': ('aggregated_transaction',
+                                ['state', 'year', 'quarter', 'transaction_type'],
+                                ['transaction_count', 'transaction_amount']),
+    'rollup_user_brand': ('aggregated_user',
+                          ['state', 'year', 'quarter', 'brand'],
+                          ['devicecount']),
+    'rollup_map_trans': ('map_trans',
+                         ['state', 'year', 'quarter'],
+                         ['count', 'amount']),
+    'rollup_map_user': ('map_user',
+                        ['state', 'year', 'quarter'],
+                        ['registeredusers', 'appopens']),
+}
+
+
+def find(table, keys, metrics):
+    # smallest rollup of `table` that can answer a GROUP BY over `keys`
+    candidates = [(len(rollup_keys), name)
+                  for name, (source, rollup_keys, measures) in ROLLUPS.items()
+                  if source == table and set(keys) <= set(rollup_keys) and set(metrics) <= set(measures)]
+    return min(candidates)[1] if candidates else None
+
+
+def build_query(name):
+    source, keys, measures = ROLLUPS[name]
+    key_cols = sql.SQL(', ').join(map(sql.Identifier, keys))
+    sums = sql.SQL(', ').join(sql.SQL('SUM({m}) AS {m}').format(m=sql.Identifier(m)) for m in measures)
+    return sql.SQL('CREATE TABLE {name} AS SELECT {keys}, {sums}, COUNT(*) AS {n} '
+                   'FROM {source} GROUP BY {keys}').format(
+        name=sql.Identifier(name), keys=key_cols, sums=sums,
+        n=sql.Identifier(ROW_COUNT), source=sql.Identifier(source))
+
+
+def build_frame(name, source_df):
+    # pandas version of build_query(), used for the Arrow snapshot
+    source, keys, measures = ROLLUPS[name]
+    grouped = source_df.groupby(keys, observed=True)
+    rollup = grouped[measures].sum()
+    rollup[ROW_COUNT] = grouped.size()
+    return rollup.reset_index()
+
+
+def rebuild(cursor, names=None):
+    for name in (names or ROLLUPS):
+        cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(name)))
+        cursor.execute(build_query(name))
+        cursor.execute(sql.SQL('CREATE INDEX ON {} (state, year, quarter)').format(sql.Identifier(name)))
+
+
+def for_tables(table_names):
+    return [name for name, (source, keys, measures) in ROLLUPS.items() if source in table_names]
+
+
+def build_rollups(conn, names=None):
+    # rebuilt in one transaction: the dashboard sees either the old rollups or
+    # the new ones, never a dropped table
+    with conn.cursor() as cursor:
+        rebuild(cursor, names)
+    conn.commit()
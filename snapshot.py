@@ -0,0 +1,115 @@
+import hashlib
+import json
+import os
+import tempfile
+
+import config
+
+
+# Columnar snapshot of the Pulse tables as uncompressed Arrow IPC files, one
+# per table. The dashboard reads them (PULSE_BACKEND=snapshot) instead of
+# querying Postgres: a file is memory-mapped and turned into columns with no
+# query, network round trip or per-row parsing, and a read replica needs
+# nothing but the snapshot directory. Only the read is fast: to_pandas()
+# and data.compact() copy the columns, so every dashboard process still
+# holds its own copy of each table.
+#
+# Each table file is named after a hash of its content
+# (<table>.<version>.arrow) and versions.json maps every table to its current
+# file. A write adds files only for tables whose content changed, then swaps
+# versions.json in: readers see the old set of tables or the new one, never
+# a mix, and rewriting unchanged data changes no version (see versions.py).
+# Superseded files are kept for one more write, for readers that still hold
+# the previous versions.json.
+#
+# pyarrow is only needed when this backend is used.
+
+SUFFIX = '.arrow'
+VERSIONS_FILE = 'versions.json'
+
+
+def path_for(table_name, directory=config.SNAPSHOT_DIR, version=None):
+    # version None: the unversioned file of a snapshot written before versions.json
+    name = table_name if version is None else f'{table_name}.{version}'
+    return os.path.join(directory, name + SUFFIX)
+
+
+def read_versions(directory=config.SNAPSHOT_DIR):
+    # table -> version of the current snapshot; None if it has no versions.json
+    try:
+        with open(os.path.join(directory, VERSIONS_FILE)) as f:
+            return json.load(f)['tables']
+    except FileNotFoundError:
+        return None
+
+
+def _content_version(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+
+def _write_versions(directory, tables, previous):
+    fd, staging = tempfile.mkstemp(prefix='.versions-', dir=directory)
+    with os.fdopen(fd, 'w') as f:
+        json.dump({'tables': tables, 'previous': previous}, f, indent=1, sort_keys=True)
+    os.replace(staging, os.path.join(directory, VERSIONS_FILE))
+
+
+def _remove_superseded(directory, tables, previous):
+    keep = {(table_name, version) for versions in (tables, previous) for table_name, version in versions.items()}
+    for file_name in os.listdir(directory):
+        if file_name.startswith('.') or not file_name.endswith(SUFFIX):
+            continue
+        table_name, _, version = file_name[:-len(SUFFIX)].partition('.')
+        if table_name in tables and (table_name, version or None) not in keep:
+            try:
+                os.remove(os.path.join(directory, file_name))
+            except OSError:
+                # still mapped by a reader (Windows); the next write retries
+                pass
+
+
+def write_snapshot(frames, directory=config.SNAPSHOT_DIR):
+    # -> names of the tables whose version changed
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    os.makedirs(directory, exist_ok=True)
+    previous = read_versions(directory) or {}
+    tables = dict(previous)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=directory)
+    try:
+        for table_name, df in frames.items():
+            staged = os.path.join(staging, table_name + SUFFIX)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            # memory mapping only works on uncompressed files
+            feather.write_feather(table, staged, compression='uncompressed')
+            tables[table_name] = _content_version(staged)
+            if tables[table_name] != previous.get(table_name):
+                os.replace(staged, path_for(table_name, directory, tables[table_name]))
+        # the commit point: readers switch to the new files from here on
+        _write_versions(directory, tables, previous)
+    finally:
+        for leftover in os.listdir(staging):
+            os.remove(os.path.join(staging, leftover))
+        os.rmdir(staging)
+    _remove_superseded(directory, tables, previous)
+    return [table_name for table_name in frames if tables[table_name] != previous.get(table_name)]
+
+
+def read_table(table_name, directory=config.SNAPSHOT_DIR, version=None):
+    # version None: whatever versions.json currently names
+    import pyarrow as pa
+
+    if version is None:
+        version = (read_versions(directory) or {}).get(table_name)
+    path = path_for(table_name, directory, version)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"no snapshot for table '{table_name}' in {directory}")
+
+    with pa.memory_map(path, 'r') as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
@@ -0,0 +1,127 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import ingest
+import names
+
+
+# Synthetic PhonePe Pulse data at a chosen scale, for benchmarks. Writes a
+# <dir>/data/... tree in the same JSON layout as the real Pulse checkout, so
+# it goes through exactly the same ingest / ETL / dashboard code:
+#
+#     states x districts per state x pincodes per district x years x quarters
+#
+# Values are random but seeded, so two runs at the same scale produce the
+# same tree.
+
+TRANSACTION_TYPES = ['Recharge & bill payments', 'Peer-to-peer payments', 'Merchant payments',
+                     'Financial Services', 'Others']
+BRANDS = ['Xiaomi', 'Samsung', 'Vivo', 'Oppo', 'OnePlus', 'Realme', 'Apple', 'Motorola', 'Others']
+
+# the top/ files only list the leading entities
+TOP_ENTRIES = 10
+
+
+def state_slugs(n):
+    slugs = list(names.STATE_NAMES)
+    return slugs[:n] + [f'state-{i}' for i in range(len(slugs), n)]
+
+
+class _Scale:
+
+    # coordinates and entity names for one generated tree
+
+    def __init__(self, states, districts, pincodes, seed):
+        rng = np.random.default_rng(seed)
+        self.states = state_slugs(states)
+        self.districts = {state: [f'{state.replace("-", " ")} {d} district' for d in range(districts)]
+                          for state in self.states}
+        self.pincodes = {state: [str(100000 + s * districts * pincodes + p) for p in range(districts * pincodes)]
+                         for s, state in enumerate(self.states)}
+        # India's bounding box
+        self.state_coordinates = {state: (rng.uniform(8, 35), rng.uniform(68, 97)) for state in self.states}
+        self.district_coordinates = {
+            (state, district): (lat + rng.normal(0, 0.5), lng + rng.normal(0, 0.5))
+            for state, (lat, lng) in self.state_coordinates.items() for district in self.districts[state]}
+
+
+def _documents(scale, state, rng):
+    # dataset -> JSON document for one state x year x quarter
+    districts = scale.districts[state]
+    pincodes = scale.pincodes[state]
+    counts = rng.integers(1_000, 5_000_000, len(districts))
+    amounts = counts * rng.uniform(50, 5_000, len(districts))
+    users = rng.integers(1_000, 2_000_000, len(districts))
+    opens = users * rng.integers(1, 50, len(districts))
+    pin_counts = rng.integers(100, 500_000, len(pincodes))
+    pin_amounts = pin_counts * rng.uniform(50, 5_000, len(pincodes))
+    pin_users = rng.integers(100, 200_000, len(pincodes))
+
+    def instrument(count, amount):
+        return {'type': 'TOTAL', 'count': int(count), 'amount': float(amount)}
+
+    def top(order, values, entity, metric):
+        return [{entity: values[i], **metric(i)} for i in order[:TOP_ENTRIES]]
+
+    top_districts = np.argsort(-amounts, kind='stable')
+    top_pincodes = np.argsort(-pin_amounts, kind='stable')
+    device_counts = rng.integers(1_000, 1_000_000, len(BRANDS))
+
+    return {
+        'aggregated_transaction': {'data': {'transactionData': [
+            {'name': name, 'paymentInstruments': [instrument(c, c * rng.uniform(50, 5_000))]}
+            for name, c in zip(TRANSACTION_TYPES, rng.integers(1_000, 50_000_000, len(TRANSACTION_TYPES)))]}},
+        'aggregated_user': {'data': {'usersByDevice': [
+            {'brand': brand, 'count': int(c), 'percentage': float(c / device_counts.sum())}
+            for brand, c in zip(BRANDS, device_counts)]}},
+        'aggregated_insurance': {'data': {'transactionData': [
+            {'name': 'Insurance', 'paymentInstruments': [instrument(counts.sum() // 100, amounts.sum() / 100)]}]}},
+        'map_insurance': {'data': {'data': {'columns': ['lat', 'lng', 'metric', 'label'], 'data': [
+            [*scale.district_coordinates[(state, district)], float(c // 100), district]
+            for district, c in zip(districts, counts)]}}},
+        'map_transaction': {'data': {'hoverDataList': [
+            {'name': district, 'metric': [instrument(c, a)]} for district, c, a in zip(districts, counts, amounts)]}},
+        'map_user': {'data': {'hoverData': {
+            district: {'registeredUsers': int(u), 'appOpens': int(o)} for district, u, o in zip(districts, users, opens)}}},
+        'top_insurance': {'data': {
+            'districts': top(top_districts, districts, 'entityName',
+                             lambda i: {'metric': instrument(counts[i] // 100, amounts[i] / 100)}),
+            'pincodes': top(top_pincodes, pincodes, 'entityName',
+                            lambda i: {'metric': instrument(pin_counts[i] // 100, pin_amounts[i] / 100)})}},
+        'top_transaction': {'data': {
+            'districts': top(top_districts, districts, 'entityName', lambda i: {'metric': instrument(counts[i], amounts[i])}),
+            'pincodes': top(top_pincodes, pincodes, 'entityName', lambda i: {'metric': instrument(pin_counts[i], pin_amounts[i])})}},
+        'top_user': {'data': {
+            'districts': top(np.argsort(-users, kind='stable'), districts, 'name',
+                             lambda i: {'registeredUsers': int(users[i])}),
+            'pincodes': top(np.argsort(-pin_users, kind='stable'), pincodes, 'name',
+                            lambda i: {'registeredUsers': int(pin_users[i])})}},
+    }
+
+
+def write_tree(directory, states=36, districts=20, pincodes=10, years=6, quarters=4, first_year=2018, seed=0):
+    # -> number of files written
+    scale = _Scale(states, districts, pincodes, seed)
+    rng = np.random.default_rng(seed + 1)
+    written = 0
+    for state in scale.states:
+        for year in range(first_year, first_year + years):
+            for quarter in range(1, quarters + 1):
+                for dataset, doc in _documents(scale, state, rng).items():
+                    year_dir = os.path.join(ingest.state_root(directory, dataset), state, str(year))
+                    os.makedirs(year_dir, exist_ok=True)
+                    with open(os.path.join(year_dir, f'{quarter}.json'), 'w') as f:
+                        json.dump(doc, f)
+                    written += 1
+    return written
+
+
+def state_loc(states=36, districts=20, pincodes=10, seed=0):
+    # the state_latlong.csv the ETL reads for state_loc, for the same tree
+    scale = _Scale(states, districts, pincodes, seed)
+    return pd.DataFrame({'state': [names.state_name(state) for state in scale.states],
+                         'latitude': [scale.state_coordinates[state][0] for state in scale.states],
+                         'longitude': [scale.state_coordinates[state][1] for state in scale.states]})
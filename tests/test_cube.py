@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import cube
+
+
+def _frame(seed=0, years=(2018, 2020, 2021), quarters=(1, 2, 3, 4), states=('Bihar', 'Goa', 'Kerala', 'Punjab')):
+    # a few rows per (state, year, quarter, type), some combinations missing
+    rng = np.random.default_rng(seed)
+    keys = pd.MultiIndex.from_product([states, years, quarters, ['p2p', 'merchant', 'bills']],
+                                      names=['state', 'year', 'quarter', 'transaction_type']).to_frame(index=False)
+    df = keys.loc[keys.index.repeat(rng.integers(0, 3, len(keys)))].reset_index(drop=True)
+    df['transaction_count'] = rng.integers(0, 1000, len(df))
+    df['transaction_amount'] = rng.uniform(0, 1e6, len(df))
+    return df.astype({'year': np.int16, 'quarter': np.int8, 'state': 'category'})
+
+
+def _cube(df):
+    return cube.Cube(df, ['transaction_count', 'transaction_amount'], ['transaction_type'])
+
+
+def _filtered(df, year, quarter, state):
+    mask = np.ones(len(df), dtype=bool)
+    for column, values in (('year', year), ('quarter', quarter), ('state', state)):
+        if values is not None:
+            mask &= df[column].isin(values).to_numpy()
+    return df[mask]
+
+
+SELECTIONS = [
+    (None, None, None),
+    ([2020], [3, 1], None),
+    ([2021, 2018], None, ['Punjab', 'Goa']),
+    ([2019], None, None),
+    (None, [2], ['Nowhere']),
+]
+
+
+@pytest.mark.parametrize('year, quarter, state', SELECTIONS)
+def test_total_matches_filtered_sum(year, quarter, state):
+    df = _frame()
+    rows = _filtered(df, year, quarter, state)
+    table_cube = _cube(df)
+    for metric in ('transaction_count', 'transaction_amount'):
+        assert table_cube.total(metric, year=year, quarter=quarter, state=state) == pytest.approx(rows[metric].sum())
+
+
+@pytest.mark.parametrize('year, quarter, state', SELECTIONS)
+@pytest.mark.parametrize('by', ['state', 'year', 'quarter', 'transaction_type'])
+@pytest.mark.parametrize('agg', ['sum', 'mean'])
+def test_group_matches_groupby(year, quarter, state, by, agg):
+    df = _frame()
+    expected = _filtered(df, year, quarter, state).groupby(by, observed=True)['transaction_amount'].agg(agg)
+    result = _cube(df).group(by, 'transaction_amount', agg, year=year, quarter=quarter, state=state)
+    assert result[by].tolist() == expected.index.tolist()
+    np.testing.assert_allclose(result['transaction_amount'].to_numpy(), expected.to_numpy())
+
+
+def test_integer_sums_stay_integers():
+    assert _cube(_frame()).group('state', 'transaction_count')['transaction_count'].dtype.kind == 'i'
+
+
+def test_rows_with_missing_keys_are_left_out():
+    df = _frame()
+    df['state'] = df['state'].cat.add_categories(['Unknown'])
+    df.loc[:4, 'state'] = None
+    assert _cube(df).total('transaction_count') == df.dropna(subset=['state'])['transaction_count'].sum()
+
+
+def _growth_by_hand(df, period):
+    sums = df.groupby(['year', 'quarter'])['transaction_amount'].sum()
+    growth = {}
+    for (year, quarter), value in sums.items():
+        if period == 'year':
+            previous = (year - 1, quarter)
+        else:
+            previous = (year, quarter - 1) if quarter > 1 else (year - 1, 4)
+        growth[(year, quarter)] = value / sums[previous] - 1 if previous in sums.index else np.nan
+    return sums, growth
+
+
+@pytest.mark.parametrize('period', cube.PERIODS)
+def test_growth_compares_with_the_previous_calendar_period(period):
+    # 2019 is missing entirely and 2020 only has Q1 and Q3
+    df = _frame(quarters=(1, 3, 4), years=(2018, 2020, 2021))
+    df = df[(df['year'] != 2020) | df['quarter'].isin([1, 3])]
+    sums, expected = _growth_by_hand(df, period)
+
+    result = _cube(df).growth('transaction_amount', period)
+    assert list(zip(result['year'], result['quarter'])) == list(sums.index)
+    np.testing.assert_allclose(result['growth'].to_numpy(), [expected[key] for key in sums.index])
+    # nothing before 2020 Q1 / Q3 in the same quarter of 2019 or in 2019 Q4 / 2020 Q2
+    first_2020 = result[result['year'] == 2020]
+    assert first_2020['growth'].isna().all()
+
+
+def test_growth_filters_after_computing():
+    df = _frame()
+    full = _cube(df).growth('transaction_amount', 'quarter', by_state=True)
+    picked = _cube(df).growth('transaction_amount', 'quarter', by_state=True, year=[2021], state=['Goa'])
+    expected = full[(full['year'] == 2021) & (full['state'] == 'Goa')].reset_index(drop=True)
+    pd.testing.assert_frame_equal(picked, expected)
+
+
+def test_unknown_growth_period():
+    with pytest.raises(ValueError):
+        _cube(_frame()).growth('transaction_amount', 'month')
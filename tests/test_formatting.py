@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from formatting import RUPEE, indian_number, indian_rupees
+
+
+def _reference(value, decimals=2):
+    # one value at a time, the way en_IN's locale.currency() groups digits
+    whole, _, fraction = f'{abs(value):.{decimals}f}'.partition('.')
+    head, tail = whole[:-3], whole[-3:]
+    pairs = []
+    while head:
+        head, pairs = head[:-2], [head[-2:]] + pairs
+    text = ','.join(pairs + [tail]) + ('.' + fraction if decimals else '')
+    return ('-' if value < 0 and float(text.replace(',', '')) else '') + RUPEE + text
+
+
+@pytest.mark.parametrize('amount, expected', [
+    (0, '₹0.00'),
+    (7.5, '₹7.50'),
+    (999.994, '₹999.99'),
+    (999.996, '₹1,000.00'),
+    (123456.789, '₹1,23,456.79'),
+    (1234567, '₹12,34,567.00'),
+    (10 ** 9, '₹1,00,00,00,000.00'),
+    (-1234567.5, '-₹12,34,567.50'),
+    (-0.006, '-₹0.01'),
+])
+def test_indian_rupees(amount, expected):
+    assert indian_rupees(amount) == expected
+
+
+@pytest.mark.parametrize('amount', [-0.001, -0.0049, -0.0])
+def test_negative_amounts_that_round_to_zero_have_no_sign(amount):
+    assert indian_rupees(amount) == '₹0.00'
+
+
+def test_matches_reference_grouping():
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.uniform(-1e13, 1e13, 500), rng.uniform(-1e4, 1e4, 500),
+                             10.0 ** np.arange(13), -(10.0 ** np.arange(13)) + 0.01])
+    for decimals in (0, 2):
+        assert indian_number(values, decimals).tolist() == [_reference(v, decimals) for v in values]
+
+
+def test_series_keeps_index_and_name_and_blanks_missing():
+    values = pd.Series([1500.0, np.nan, np.inf, 25.0], index=list('abcd'), name='amount')
+    result = indian_number(values, 0, symbol='')
+    assert result.index.tolist() == list('abcd')
+    assert result.name == 'amount'
+    assert result.tolist() == ['1,500', '', '', '25']
+
+
+def test_keeps_array_shape():
+    assert indian_number(np.array([[1e5, 2.0], [3.0, -4e7]]), 0).tolist() == [['₹1,00,000', '₹2'],
+                                                                              ['₹3', '-₹4,00,00,000']]
@@ -0,0 +1,76 @@
+import numpy as np
+import pandas as pd
+
+import geo
+
+
+def _frames():
+    return {
+        'map_user': pd.DataFrame({'state': ['Goa', 'Goa', 'Kerala'], 'year': [2022] * 3, 'quarter': [1] * 3,
+                                  'name': ['North Goa', 'South Goa', 'Kochi'],
+                                  'registeredusers': [10, 20, 30], 'appopens': [1, 2, 3]}),
+        'top_user_district': pd.DataFrame({'state': ['Goa', 'Kerala'], 'year': [2022] * 2, 'quarter': [1] * 2,
+                                           'name': ['north goa district', 'Kochi'], 'registeredusers': [10, 30]}),
+        'map_insurance': pd.DataFrame({'state': ['Goa', 'Kerala'], 'year': [2022] * 2, 'quarter': [1] * 2,
+                                       'lat': [15.5, 9.9], 'lng': [73.8, 76.3], 'metric': [1.0, 2.0],
+                                       'label': ['North Goa District', 'kochi']}),
+        'state_loc': pd.DataFrame({'state': ['Goa', 'Kerala'], 'latitude': [15.3, 10.8], 'longitude': [74.1, 76.2]}),
+    }
+
+
+def test_district_key_ignores_case_spacing_and_suffix():
+    keys = geo.district_key(['North Goa', 'north goa district', 'NORTH-GOA', 'North Goa District'])
+    assert keys.tolist() == ['northgoa', 'northgoa', 'northgoa', 'northgoa']
+
+
+def test_differently_spelled_districts_share_one_id():
+    frames = geo.add_dimensions(_frames())
+    districts = frames[geo.GEO_DISTRICT]
+    assert sorted(districts['district_key']) == ['kochi', 'northgoa', 'southgoa']
+    assert frames['map_user']['district_id'].iloc[0] == frames['top_user_district']['district_id'].iloc[0]
+    # coordinates come from map_insurance, matched on the normalized key
+    north_goa = districts.set_index('district_key').loc['northgoa']
+    assert (north_goa['latitude'], north_goa['longitude']) == (15.5, 73.8)
+    assert np.isnan(districts.set_index('district_key').loc['southgoa', 'latitude'])
+
+
+def test_states_get_ids_and_coordinates():
+    frames = geo.add_dimensions(_frames())
+    states = frames[geo.GEO_STATE].set_index('state')
+    assert states['state_id'].tolist() == [1, 2]
+    assert states.loc['Kerala', ['latitude', 'longitude']].tolist() == [10.8, 76.2]
+    assert frames['map_user']['state_id'].tolist() == [1, 1, 2]
+    assert frames['map_user']['state_id'].dtype == np.int64
+
+
+def test_existing_ids_are_kept_and_new_ones_appended():
+    first = geo.add_dimensions(_frames())
+    later = _frames()
+    later['map_user'] = pd.DataFrame({'state': ['Assam', 'Goa'], 'year': [2023] * 2, 'quarter': [1] * 2,
+                                      'name': ['Kamrup', 'South Goa District'], 'registeredusers': [5, 6],
+                                      'appopens': [0, 0]})
+    frames = geo.add_dimensions(later, first[geo.GEO_STATE], first[geo.GEO_DISTRICT])
+
+    states = frames[geo.GEO_STATE].set_index('state')['state_id']
+    assert states.to_dict() == {'Goa': 1, 'Kerala': 2, 'Assam': 3}
+    districts = frames[geo.GEO_DISTRICT].set_index('district_key')['district_id']
+    old = first[geo.GEO_DISTRICT].set_index('district_key')['district_id']
+    assert districts[old.index].tolist() == old.tolist()
+    assert districts['kamrup'] == old.max() + 1
+    assert frames['map_user']['district_id'].tolist() == [districts['kamrup'], old['southgoa']]
+
+
+def test_changed_rows_are_new_or_moved_only():
+    first = geo.add_dimensions(_frames())
+    later = {'map_user': pd.DataFrame({'state': ['Assam', 'Goa'], 'year': [2023] * 2, 'quarter': [1] * 2,
+                                       'name': ['Kamrup', 'North Goa'], 'registeredusers': [5, 6],
+                                       'appopens': [0, 0]}),
+             'state_loc': pd.DataFrame({'state': ['Goa', 'Kerala'], 'latitude': [15.3, 11.0],
+                                        'longitude': [74.1, 76.2]})}
+    frames = geo.add_dimensions(later, first[geo.GEO_STATE], first[geo.GEO_DISTRICT])
+
+    states = geo.changed_rows(geo.GEO_STATE, frames[geo.GEO_STATE], first[geo.GEO_STATE])
+    assert states['state'].tolist() == ['Kerala', 'Assam']
+    districts = geo.changed_rows(geo.GEO_DISTRICT, frames[geo.GEO_DISTRICT], first[geo.GEO_DISTRICT])
+    assert districts['district_key'].tolist() == ['kamrup']
+    assert geo.changed_rows(geo.GEO_DISTRICT, first[geo.GEO_DISTRICT], first[geo.GEO_DISTRICT]).empty
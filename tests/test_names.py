@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import names
+
+
+def test_state_slugs_become_dashboard_names():
+    values = pd.Series(['andhra-pradesh', 'delhi', 'andaman-&-nicobar-islands', 'andhra-pradesh'])
+    assert names.canonical_states(values).tolist() == ['AndhraPradesh', 'Delhi', 'Andaman NicobarIslands',
+                                                       'AndhraPradesh']
+
+
+def test_unknown_states_pass_through():
+    assert names.state_name('new-territory') == 'new-territory'
+    assert names.canonical_states(pd.Series(['new-territory'])).tolist() == ['new-territory']
+
+
+def test_districts_lose_the_suffix_and_get_title_case():
+    values = pd.Series(['north goa district', 'bengaluru urban district', 'leh ladakh'])
+    assert names.canonical_districts(values).tolist() == ['North Goa', 'Bengaluru Urban', 'Leh Ladakh']
+
+
+@pytest.mark.parametrize('categorical', [False, True])
+def test_one_pass_matches_a_rename_per_value(categorical):
+    # what the notebook did with one Series.replace() per (old, new) pair
+    rng = np.random.default_rng(0)
+    slugs = np.array(list(names.STATE_NAMES) + ['new-territory'], dtype=object)
+    values = pd.Series(rng.choice(slugs, 2000), index=rng.permutation(2000), name='state')
+    values[values.sample(50, random_state=0).index] = None
+    if categorical:
+        values = values.astype('category')
+
+    result = names.canonical_states(values)
+    expected = [None if v is None or v != v else names.STATE_NAMES.get(v, v) for v in values.astype(object)]
+    assert [None if v != v else v for v in result.astype(object)] == expected
+    assert result.index.equals(values.index)
+    assert result.name == 'state'
+    assert isinstance(result.dtype, pd.CategoricalDtype) == categorical
+
+
+def test_canonicalize_renames_state_and_district_columns_in_place():
+    df = pd.DataFrame({'state': ['tamil-nadu'], 'name': ['chennai district'], 'count': [3]})
+    assert names.canonicalize('map_user', df) is df
+    assert df.to_dict('records') == [{'state': 'TamilNadu', 'name': 'Chennai', 'count': 3}]
+
+
+def test_tables_without_districts_keep_their_other_columns():
+    df = pd.DataFrame({'state': ['goa'], 'brand': ['Xiaomi district']})
+    names.canonicalize('aggregated_user', df)
+    assert df.to_dict('records') == [{'state': 'Goa', 'brand': 'Xiaomi district'}]
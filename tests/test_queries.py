@@ -0,0 +1,91 @@
+import numpy as np
+from psycopg2 import sql
+
+import queries
+
+
+def render(query):
+    # the SQL text of a composed query, without a connection to quote with
+    if isinstance(query, sql.Composed):
+        return ''.join(render(part) for part in query.seq)
+    if isinstance(query, sql.Identifier):
+        return '.'.join(f'"{name}"' for name in query.strings)
+    return query.string
+
+
+def test_no_filters_no_where():
+    condition, params = queries.where()
+    assert render(condition) == ''
+    assert params == []
+
+
+def test_filters_become_any_parameters():
+    condition, params = queries.where(year=[np.int64(2021), 2022], state=['Goa'], table='map_trans')
+    assert render(condition) == ' WHERE "map_trans"."year" = ANY(%s) AND "map_trans"."state" = ANY(%s)'
+    # numpy scalars from the multiselects are turned into plain Python values
+    assert params == [[2021, 2022], ['Goa']]
+    assert type(params[0][0]) is int
+
+
+def test_empty_selection_still_filters():
+    condition, params = queries.where(quarter=[])
+    assert render(condition) == ' WHERE "quarter" = ANY(%s)'
+    assert params == [[]]
+
+
+def test_distinct():
+    query, params = queries.distinct('aggregated_user', 'brand')
+    assert render(query) == 'SELECT DISTINCT "brand" FROM "aggregated_user" ORDER BY "brand"'
+    assert params == []
+
+
+def test_total():
+    query, params = queries.total('aggregated_insurance', ['count', 'amount'], year=[2020])
+    assert render(query) == ('SELECT COALESCE(SUM("count"), 0) AS "count", COALESCE(SUM("amount"), 0) AS "amount" '
+                             'FROM "aggregated_insurance" WHERE "year" = ANY(%s)')
+    assert params == [[2020]]
+
+
+def test_group_by_key():
+    query, params = queries.group('map_user', 'year', 'appopens', agg='mean')
+    assert render(query) == ('SELECT "year", AVG("appopens") AS "appopens" FROM "map_user" '
+                             'GROUP BY "year" ORDER BY "year"')
+    assert params == []
+
+
+def test_top_k_breaks_ties_by_key():
+    query, params = queries.group('top_user_pincode', 'pincode', 'registeredusers', state=['Goa'],
+                                  order='metric', limit=10)
+    assert render(query) == ('SELECT "pincode", SUM("registeredusers") AS "registeredusers" FROM "top_user_pincode" '
+                             'WHERE "state" = ANY(%s) GROUP BY "pincode" '
+                             'ORDER BY "registeredusers" DESC, "pincode" LIMIT %s')
+    assert params == [['Goa'], 10]
+
+
+def test_top_k_with_ties():
+    query, params = queries.group('map_trans', 'state', 'count', order='metric', limit=np.int64(3), ties='all')
+    assert render(query).endswith('ORDER BY "count" DESC FETCH FIRST %s ROWS WITH TIES')
+    assert params == [3] and type(params[0]) is int
+
+
+def test_mean_over_a_rollup_is_weighted_by_rows():
+    query, _ = queries.group('rollup_map_trans', 'year', 'amount', agg='mean', weight='n_rows')
+    assert 'SUM("amount")::float8 / NULLIF(SUM("n_rows"), 0) AS "amount"' in render(query)
+
+
+def test_map_join_filters_the_fact_table():
+    query, params, columns = queries.map_join('user', year=[2022], quarter=[1, 2])
+    assert render(query).endswith('WHERE "map_user"."year" = ANY(%s) AND "map_user"."quarter" = ANY(%s)')
+    assert params == [[2022], [1, 2]]
+    assert columns == ['state', 'year', 'quarter', 'district', 'users', 'appopens', 'latitude', 'longitude']
+
+
+def test_map_points_sums_per_location():
+    query, params = queries.map_points('transaction', ['state', 'district'], ['count', 'amount'], state=['Goa'])
+    text = render(query)
+    assert text.startswith('SELECT "state", "district", "latitude", "longitude", '
+                           'SUM("count") AS "count", SUM("amount") AS "amount" FROM (select map_trans.state,')
+    assert ('WHERE "map_trans"."state" = ANY(%s)) AS loc("state", "year", "quarter", "district", "count", "amount", '
+            '"latitude", "longitude") GROUP BY "state", "district", "latitude", "longitude" '
+            'ORDER BY "state", "district", "latitude", "longitude"') in ' '.join(text.split())
+    assert params == [['Goa']]
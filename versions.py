@@ -0,0 +1,103 @@
+import threading
+import time
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+import config
+import db
+import snapshot
+
+
+# Per-table data versions published by the ETL. Every load that changes a
+# table bumps its version in the same transaction as the data (Postgres) or
+# in the snapshot's manifest, which is swapped in after the table files
+# (snapshot.py). A reader that sees a version therefore always finds the
+# data it describes.
+#
+# The dashboard reads all versions with one small query, at most every
+# PULSE_VERSION_CHECK_SECONDS, and reloads only the tables whose version
+# moved; caches stamped with the old versions miss from then on. A store
+# without version records (loaded before they existed) falls back to
+# PULSE_CACHE_TTL.
+
+VERSIONS_TABLE = 'data_versions'
+
+CREATE_VERSIONS = f'''CREATE TABLE IF NOT EXISTS {VERSIONS_TABLE} (
+    table_name TEXT PRIMARY KEY,
+    version BIGINT NOT NULL,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+)'''
+
+
+### ETL side
+
+def bump(cursor, table_names):
+    # call inside the transaction that writes the tables
+    cursor.execute(CREATE_VERSIONS)
+    execute_values(cursor, f'''INSERT INTO {VERSIONS_TABLE} (table_name, version)
+                               VALUES %s
+                               ON CONFLICT (table_name) DO UPDATE SET
+                                   version = {VERSIONS_TABLE}.version + 1, loaded_at = now()''',
+                   [(table_name, 1) for table_name in sorted(set(table_names))])
+
+
+### dashboard side
+
+_UNREAD = object()
+
+_lock = threading.Lock()
+_published = _UNREAD
+_checked_at = None
+
+
+def read_versions():
+    # table -> version as published right now; None if the store has none
+    if config.BACKEND == 'snapshot':
+        return snapshot.read_versions()
+    try:
+        with db.get_pool().connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute(f'SELECT table_name, version FROM {VERSIONS_TABLE}')
+                return dict(cursor.fetchall())
+    except psycopg2.errors.UndefinedTable:
+        return None
+
+
+def published(max_age=None):
+    # read_versions(), re-read at most every max_age seconds and shared by
+    # every session
+    global _published, _checked_at
+    max_age = config.VERSION_CHECK_SECONDS if max_age is None else max_age
+    with _lock:
+        if _published is not _UNREAD:
+            if time.monotonic() - _checked_at < max_age:
+                return _published
+            # claimed before the read: concurrent reruns keep using the
+            # last versions instead of all querying at once
+            _checked_at = time.monotonic()
+    try:
+        versions = read_versions()
+    except (psycopg2.OperationalError, db.PoolTimeout):
+        # database unreachable: keep serving the loaded tables as they are
+        # and check again after max_age (loads surface the error themselves)
+        with _lock:
+            if _published is _UNREAD:
+                _published = None
+            _checked_at = time.monotonic()
+            return _published
+    with _lock:
+        _published, _checked_at = versions, time.monotonic()
+    return versions
+
+
+def of(table_name):
+    versions = published()
+    return None if versions is None else versions.get(table_name)
+
+
+def forget():
+    # the next published() reads the versions again
+    global _published
+    with _lock:
+        _published = _UNREAD